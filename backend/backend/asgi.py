@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Live results dashboard streams events only when served through this application
+(e.g. ``uvicorn backend.asgi:application``), under WSGI the dashboard refreshes periodically.
 """
 
 import os
@@ -3,10 +3,6 @@ from pathlib import Path
 from django.contrib.messages import constants as messages
 from django.core.management.utils import get_random_secret_key
 import environ
-import matplotlib
-
-# use non-interactive backend for generating plots
-matplotlib.use('agg')
 
 env = environ.Env()
 environ.Env.read_env()
@@ -154,6 +150,32 @@ MESSAGE_TAGS = {
         messages.ERROR: 'alert-danger',
  }
 
+# skips benchmarks unless they are asked for, see tasex.test_runner
+TEST_RUNNER = 'tasex.test_runner.TestRunner'
+
+# blind codes given to samples, see tasex.codes
+TASEX_SAMPLE_CODES = {
+    'ALLOCATOR': env('SAMPLE_CODE_ALLOCATOR', default='tasex.codes.CodeAllocator'),
+    'LENGTH': env.int('SAMPLE_CODE_LENGTH', default=4),
+    'CHECK_DIGIT': env.bool('SAMPLE_CODE_CHECK_DIGIT', default=False),
+    'UNIQUE': env('SAMPLE_CODE_UNIQUE', default='panel'),
+}
+
+# where panelists' progress is kept: database session or signed cookie (no session writes)
+TASEX_PANEL_STATE_STORE = env('PANEL_STATE_STORE', default='tasex.state.SessionPanelStateStore')
+
+# seconds a worker trusts panel status it has seen, 0 turns the per-process status cache off
+TASEX_PANEL_STATUS_TTL = env.int('PANEL_STATUS_TTL', default=5)
+
+# pub/sub for the live results dashboard, the local one reaches only dashboards served by the same process
+TASEX_LIVE_BROKER = env('LIVE_BROKER', default='tasex.live.LocalBroker')
+
+# cache alias for rendered QR codes, point it to a file based cache to keep them across restarts
+TASEX_QR_CACHE = env('QR_CACHE', default='default')
+
+# demo panels built ahead for new demo visitors, the pool is refilled by the fill_demo_panel_pool command
+DEMO_PANEL_POOL_SIZE = env.int('DEMO_PANEL_POOL_SIZE', default=20)
+
 BOOTSTRAP5 = {
     'css_url': '/static/bootstrap.min.css',
 }
@@ -0,0 +1,29 @@
+from time import monotonic, sleep
+
+from django.core.management.base import BaseCommand
+
+from ...utils import fill_panel_pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds demo panels ahead of time, new demo visitors get one of them instead of waiting for a new panel. '
+        'Run it from cron, or keep it running with --interval'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, help='pooled panels to keep, DEMO_PANEL_POOL_SIZE by default')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='seconds between runs, the command keeps running when set'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = monotonic()
+            added = fill_panel_pool(options['size'])
+            if options['verbosity'] >= 1:
+                self.stdout.write(f'Added {added} demo panels to the pool in {monotonic() - started:.1f} s')
+            if options['interval'] <= 0:
+                break
+            sleep(options['interval'])
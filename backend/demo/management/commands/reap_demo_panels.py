@@ -0,0 +1,48 @@
+from time import monotonic, sleep
+
+from django.core.management.base import BaseCommand
+
+from tasex.purge import PURGE_BATCH_SIZE
+from ...utils import reap_expired_session_panels
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes panels of demo sessions which expired, a batch of panels per transaction. '
+        'Run it from cron, or keep it running with --interval'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='panels deleted at once')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='seconds between runs, the command keeps running when set'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        while True:
+            self.reap(options['batch_size'])
+            if options['interval'] <= 0:
+                break
+            sleep(options['interval'])
+
+    def reap(self, batch_size):
+        started = batch_started = monotonic()
+        total_panels = total_rows = 0
+        for panels, rows in reap_expired_session_panels(batch_size):
+            total_panels += panels
+            total_rows += rows
+            # every batch with -v 2
+            self.log(2, panels, rows, batch_started)
+            batch_started = monotonic()
+        self.log(1, total_panels, total_rows, started)
+
+    def log(self, verbosity, panels, rows, started):
+        if self.verbosity < verbosity:
+            return
+        seconds = monotonic() - started
+        self.stdout.write(
+            f'Deleted {panels} demo panels ({rows} rows) in {seconds:.1f} s, '
+            f'{panels / seconds if seconds else 0:.0f} panels/s'
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demo', '0002_alter_demoinstance_panel_alter_demoparam_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='demoinstance',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='demoinstance',
+            name='session_key',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+    ]
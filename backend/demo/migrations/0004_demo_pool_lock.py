@@ -0,0 +1,26 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:30
+
+from django.db import migrations
+
+
+def create_pool_lock(apps, schema_editor):
+    DemoParam = apps.get_model('demo', 'DemoParam')
+    # the row refills of the panel pool lock, made once here so concurrent refills can't each create one
+    if not DemoParam.objects.filter(key='DEMO_POOL_LOCK').exists():
+        DemoParam.objects.create(key='DEMO_POOL_LOCK', value='')
+
+
+def delete_pool_lock(apps, schema_editor):
+    DemoParam = apps.get_model('demo', 'DemoParam')
+    DemoParam.objects.filter(key='DEMO_POOL_LOCK').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demo', '0003_demoinstance_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pool_lock, delete_pool_lock),
+    ]
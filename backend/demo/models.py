@@ -4,9 +4,10 @@ from tasex.models import Panel
 
 
 class DemoInstance(models.Model):
-    session_key = models.CharField(max_length=50)
+    session_key = models.CharField(max_length=50, db_index=True)
     panel = models.ForeignKey(Panel, on_delete=models.CASCADE, related_name='sessions')
-    created_at = models.DateTimeField(auto_now_add=True)
+    # expiry of sessions not kept in the database is told by age
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
 
 class DemoParam(models.Model):
@@ -0,0 +1,24 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from tasex.models import Product, Experiment, Scale, Panel
+from .models import DemoParam
+from .utils import DEMO_KEYS, DEMO_PARAMS_CACHE_KEY, forget_demo_params
+
+
+@receiver((post_save, post_delete), sender=DemoParam)
+def demo_param_changed(sender, instance, **kwargs):
+    if instance.key in DEMO_KEYS:
+        forget_demo_params()
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Experiment)
+@receiver(post_delete, sender=Scale)
+@receiver(post_delete, sender=Panel)
+def demo_object_deleted(sender, instance, **kwargs):
+    # deleting session panels does not throw away the shared demo objects
+    params = cache.get(DEMO_PARAMS_CACHE_KEY)
+    if params and str(instance.pk) in params.values():
+        forget_demo_params()
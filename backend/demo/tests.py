@@ -1,3 +1,239 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tasex.models import Experiment, Panel, PanelQuestion, Result, Answer, SampleSet
+from .models import DemoInstance, DemoParam
+from .utils import (ensure_demo_data, fill_panel_pool, get_session_panel, create_demo_panel_questions, create_panel_results,
+                    expired_session_panels, DEMO_EXPERIMENT_KEY, DEMO_PARAMS_CACHE_KEY, DEMO_POOL_LOCK_KEY,
+                    POOLED_SESSION_KEY)
+
+
+class EnsureDemoDataTests(TestCase):
+    def setUp(self):
+        # cached ids of demo objects rolled back by previous tests
+        cache.clear()
+
+    def test_returning_session_costs_single_query(self):
+        panel = ensure_demo_data('session_key')
+        self.assertEquals(len(cache.get(DEMO_PARAMS_CACHE_KEY)), 6)
+        with self.assertNumQueries(1):
+            self.assertEquals(ensure_demo_data('session_key'), panel)
+
+        # new session reuses the shared demo objects
+        other = ensure_demo_data('other_session_key')
+        self.assertNotEqual(other, panel)
+        self.assertEquals(other.experiment_id, panel.experiment_id)
+        self.assertEquals(Experiment.objects.count(), 1)
+
+    def test_duplicated_session_panel_replaced(self):
+        panel = ensure_demo_data('session_key')
+        DemoInstance.objects.create(session_key='session_key', panel=panel)
+        new_panel = ensure_demo_data('session_key')
+        self.assertNotEqual(new_panel, panel)
+        self.assertEquals(get_session_panel('session_key'), new_panel)
+
+    def test_deleted_demo_object_recreated(self):
+        panel = ensure_demo_data('session_key')
+        # deleting a session panel keeps the cache
+        Panel.objects.get(id=panel.id).delete()
+        self.assertIsNotNone(cache.get(DEMO_PARAMS_CACHE_KEY))
+
+        Experiment.objects.all().delete()
+        self.assertIsNone(cache.get(DEMO_PARAMS_CACHE_KEY))
+        panel = ensure_demo_data('session_key')
+        self.assertEquals(str(panel.experiment_id), DemoParam.objects.get(key=DEMO_EXPERIMENT_KEY).value)
+
+    def test_demo_objects_deleted_by_other_process(self):
+        ensure_demo_data('session_key')
+        params = cache.get(DEMO_PARAMS_CACHE_KEY)
+        Experiment.objects.all().delete()
+        # cache of another process still has the old ids
+        cache.set(DEMO_PARAMS_CACHE_KEY, params)
+
+        panel = ensure_demo_data('other_session_key')
+        self.assertEquals(str(panel.experiment_id), DemoParam.objects.get(key=DEMO_EXPERIMENT_KEY).value)
+        self.assertEquals(cache.get(DEMO_PARAMS_CACHE_KEY)[DEMO_EXPERIMENT_KEY], str(panel.experiment_id))
+
+    def test_index_page(self):
+        response = self.client.get(reverse('demo:index'))
+        self.assertEquals(response.status_code, 200)
+        panel = response.context['panel']
+        self.assertEquals(len(response.context['sample_set']), 3)
+
+        response = self.client.get(reverse('demo:index'))
+        self.assertEquals(response.context['panel'], panel)
+
+
+class PanelPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def pooled(self):
+        return DemoInstance.objects.filter(session_key=POOLED_SESSION_KEY)
+
+    def test_new_session_claims_pooled_panel(self):
+        output = StringIO()
+        call_command('fill_demo_panel_pool', size=2, stdout=output)
+        self.assertTrue(output.getvalue().startswith('Added 2 demo panels to the pool'))
+        first_pooled = self.pooled().order_by('id').first().panel
+
+        # session panels, claim, claimed panel
+        with self.assertNumQueries(3):
+            panel = ensure_demo_data('session_key')
+        self.assertEquals(panel, first_pooled)
+        self.assertEquals(PanelQuestion.objects.filter(panel=panel).count(), 3)
+        self.assertEquals(self.pooled().count(), 1)
+        self.assertEquals(ensure_demo_data('session_key'), panel)
+
+        # pooled panels do not expire
+        self.assertEquals(list(expired_session_panels()), [panel.id])
+
+        call_command('fill_demo_panel_pool', size=2, stdout=StringIO())
+        self.assertEquals(self.pooled().count(), 2)
+
+    def test_refill_counts_pool_again(self):
+        self.assertEquals(fill_panel_pool(2), 2)
+        self.assertEquals(fill_panel_pool(2), 0)
+        self.assertEquals(self.pooled().count(), 2)
+
+    def test_refill_locks_migrated_row(self):
+        fill_panel_pool(1)
+        self.assertEquals(DemoParam.objects.filter(key=DEMO_POOL_LOCK_KEY).count(), 1)
+        DemoParam.objects.filter(key=DEMO_POOL_LOCK_KEY).delete()
+        with self.assertRaises(ImproperlyConfigured):
+            fill_panel_pool(2)
+
+    def test_pooled_panels_of_old_demo_experiment_dropped(self):
+        fill_panel_pool(2)
+        stale_panels = set(self.pooled().values_list('panel_id', flat=True))
+        # demo experiment replaced
+        experiment = Experiment.objects.get()
+        experiment.pk = None
+        experiment.save()
+        DemoParam.objects.filter(key=DEMO_EXPERIMENT_KEY).update(value=experiment.id)
+        cache.clear()
+
+        panel = ensure_demo_data('session_key')
+        self.assertNotIn(panel.id, stale_panels)
+        self.assertEquals(panel.experiment, experiment)
+
+        self.assertEquals(fill_panel_pool(2), 2)
+        self.assertFalse(Panel.objects.filter(id__in=stale_panels).exists())
+        self.assertEquals(
+            set(Panel.objects.filter(sessions__in=self.pooled()).values_list('experiment_id', flat=True)),
+            {experiment.id}
+        )
+
+    @override_settings(DEMO_PANEL_POOL_SIZE=1)
+    def test_empty_pool(self):
+        panel = ensure_demo_data('session_key')
+        self.assertEquals(PanelQuestion.objects.filter(panel=panel).count(), 3)
+        self.assertFalse(self.pooled().exists())
+
+        call_command('fill_demo_panel_pool', stdout=StringIO())
+        self.assertEquals(self.pooled().count(), 1)
+
+
+class CreatePanelResultsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ensure_demo_data('session_key')
+        self.panel = get_session_panel('session_key')
+
+    def test_all_sample_sets_answered(self):
+        version = self.panel.results_version
+        create_panel_results(self.panel, 0.5, seed=1)
+
+        results = Result.objects.filter(sample_set__panel=self.panel).select_related('sample_set')
+        self.assertEquals(results.count(), self.panel.planned_panelists)
+        for result in results:
+            self.assertEquals(result.is_correct, result.odd_sample_id == result.sample_set.odd_sample_id)
+            self.assertEquals(result.odd_sample.sample_set_id, result.sample_set_id)
+        self.assertEquals(Answer.objects.filter(result__in=results).count(), self.panel.planned_panelists * 3)
+        self.assertFalse(SampleSet.objects.filter(panel=self.panel, is_used=False).exists())
+        self.assertGreater(Panel.objects.get(id=self.panel.id).results_version, version)
+
+        # nothing left to answer
+        create_panel_results(self.panel)
+        self.assertEquals(Result.objects.filter(sample_set__panel=self.panel).count(), self.panel.planned_panelists)
+
+    def test_reset_panel_view(self):
+        session = self.client.session
+        session.save()
+        panel = ensure_demo_data(session.session_key)
+        create_panel_results(panel, seed=1)
+
+        self.client.get(reverse('demo:reset_panel'))
+        self.assertFalse(Result.objects.filter(sample_set__panel=panel).exists())
+        self.assertFalse(Answer.objects.filter(question__panel=panel).exists())
+        self.assertEquals(SampleSet.objects.filter(panel=panel, is_used=False).count(), panel.planned_panelists)
+
+    def test_probability(self):
+        panel = Panel.objects.create(
+            experiment=self.panel.experiment,
+            description='large panel',
+            planned_panelists=2000
+        )
+        create_panel_results(panel, 1, seed=1)
+        self.assertFalse(Result.objects.filter(sample_set__panel=panel, is_correct=False).exists())
+
+    def test_query_count_does_not_depend_on_panelists(self):
+        panel = Panel.objects.create(
+            experiment=self.panel.experiment,
+            description='bigger panel',
+            planned_panelists=60
+        )
+        create_demo_panel_questions(panel)
+        # sizes fit into a single INSERT on SQLite
+        # scale points, questions, savepoint, legacy sets, sets, other samples, mark used,
+        # insert results, insert answers, bump version, release savepoint
+        with self.assertNumQueries(11):
+            create_panel_results(self.panel)
+        with self.assertNumQueries(11):
+            create_panel_results(panel)
+
+
+class ReapExpiredSessionPanelsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_session(self, expire_date):
+        session_key = f'session_{Session.objects.count()}'
+        Session.objects.create(session_key=session_key, session_data='', expire_date=expire_date)
+        return ensure_demo_data(session_key)
+
+    def test_expired_session_panels_deleted(self):
+        now = timezone.now()
+        expired = [self.create_session(now - timedelta(minutes=1)) for _ in range(3)]
+        active = self.create_session(now + timedelta(days=1))
+        # session deleted by clearsessions
+        orphan = ensure_demo_data('missing_session_key')
+
+        output = StringIO()
+        call_command('reap_demo_panels', batch_size=3, verbosity=2, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEquals(len(lines), 3)
+        self.assertTrue(lines[0].startswith('Deleted 3 demo panels (135 rows)'))
+        self.assertTrue(lines[1].startswith('Deleted 1 demo panels'))
+        self.assertTrue(lines[2].startswith('Deleted 4 demo panels'))
+
+        self.assertFalse(Panel.objects.filter(id__in=[panel.id for panel in expired + [orphan]]).exists())
+        self.assertEquals(list(DemoInstance.objects.values_list('panel_id', flat=True)), [active.id])
+        # shared demo panels are kept
+        self.assertEquals(Panel.objects.count(), 3)
+        self.assertIsNotNone(cache.get(DEMO_PARAMS_CACHE_KEY))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies', SESSION_COOKIE_AGE=60)
+    def test_sessions_outside_database_expire_by_age(self):
+        old = ensure_demo_data('old_session_key')
+        DemoInstance.objects.filter(panel=old).update(created_at=timezone.now() - timedelta(minutes=2))
+        new = ensure_demo_data('new_session_key')
+        self.assertEquals(list(expired_session_panels()), [old.id])
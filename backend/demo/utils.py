@@ -1,8 +1,17 @@
-from numpy.random import choice
-
-from django.db.models import Count
-
-from tasex.models import Product, Experiment, Panel, Scale, ScalePoint, PanelQuestion, Answer, Result, SampleSet, Sample
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist, ImproperlyConfigured
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F, Exists, OuterRef
+from django.utils import timezone
+
+from tasex.live import notify_results_changed
+from tasex.models import (Product, Experiment, Panel, Scale, ScalePoint, PanelQuestion, Answer, Result, SampleSet,
+                          Sample, SAMPLES_BATCH_SIZE)
+from tasex.purge import purge_panels, reset_panels, PURGE_BATCH_SIZE
 from .models import DemoParam, DemoInstance
 
 DEMO_PRODUCT_1_KEY = 'DEMO_PRODUCT_1'
@@ -15,29 +24,89 @@ DEMO_RESULTS = (
     DEMO_PANEL_RESULTS_SIGNIFICANT_KEY,
     DEMO_PANEL_RESULTS_INDISTINGUISHABLE_KEY
 )
+DEMO_KEYS = (
+    DEMO_PRODUCT_1_KEY,
+    DEMO_PRODUCT_2_KEY,
+    DEMO_EXPERIMENT_KEY,
+    DEMO_SCALE_ABC_KEY,
+    *DEMO_RESULTS
+)
+# session engines keeping sessions in the database, sessions of other engines expire by age of the demo instance
+DATABASE_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+# session key of demo instances holding pre-built panels not given to any session yet
+POOLED_SESSION_KEY = ''
+DEFAULT_PANEL_POOL_SIZE = 20
+# another request may claim the same pooled panel at once, then the next one is tried
+POOL_CLAIM_ATTEMPTS = 3
+# DemoParam row written to by pool refills, so refills running at once add panels one after another
+DEMO_POOL_LOCK_KEY = 'DEMO_POOL_LOCK'
+# key: value of DemoParam, for the demo objects shared by all sessions, kept until one of them changes
+DEMO_PARAMS_CACHE_KEY = 'demo:params'
+# signals forget the ids only in the process making the change, other processes with a local cache
+# notice it when creating a session panel fails, or at the latest after this time
+DEMO_PARAMS_CACHE_TIMEOUT = 5 * 60
 
 
 def reset_panel(panel):
-    sample_sets = SampleSet.objects.filter(panel=panel)
-    sample_sets.update(is_used=False)
-    results = Result.objects.filter(sample_set__in=sample_sets)
-    Answer.objects.filter(result__in=results).delete()
-    results.delete()
+    reset_panels([panel.id])
 
 
 def get_session_panel(session_key) -> Panel:
-    return DemoInstance.objects.get(session_key=session_key).panel
+    return Panel.objects.get(sessions__session_key=session_key)
+
+
+def get_demo_param(key):
+    # while the demo data is being verified or created there is nothing cached yet
+    params = cache.get(DEMO_PARAMS_CACHE_KEY)
+    if params is not None:
+        return params[key]
+    return DemoParam.objects.get(key=key).value
+
+
+def forget_demo_params():
+    cache.delete(DEMO_PARAMS_CACHE_KEY)
 
 
 def get_significant_result_id():
-    return DemoParam.objects.get(key=DEMO_PANEL_RESULTS_SIGNIFICANT_KEY).value
+    return get_demo_param(DEMO_PANEL_RESULTS_SIGNIFICANT_KEY)
 
 
 def get_indistinguishable_result_id():
-    return DemoParam.objects.get(key=DEMO_PANEL_RESULTS_INDISTINGUISHABLE_KEY).value
+    return get_demo_param(DEMO_PANEL_RESULTS_INDISTINGUISHABLE_KEY)
 
 
-def ensure_demo_data(session_key):
+def ensure_demo_data(session_key) -> Panel:
+    # a returning visitor costs the session panel query, a new one claims a pre-built panel
+    ensure_demo_params()
+    panels = session_panels(session_key)
+    if len(panels) == 1:
+        return panels[0]
+    if panels:
+        clean_session_panel(session_key)
+    try:
+        return claim_pooled_panel(session_key) or create_session_panel(session_key)
+    except (ObjectDoesNotExist, IntegrityError):
+        # cached demo objects were deleted by another process
+        forget_demo_params()
+        ensure_demo_params()
+        return create_session_panel(session_key)
+
+
+def ensure_demo_params():
+    # shared demo objects are checked only when not cached
+    if cache.get(DEMO_PARAMS_CACHE_KEY) is None:
+        ensure_shared_demo_data()
+        cache.set(
+            DEMO_PARAMS_CACHE_KEY,
+            dict(DemoParam.objects.filter(key__in=DEMO_KEYS).values_list('key', 'value')),
+            DEMO_PARAMS_CACHE_TIMEOUT
+        )
+
+
+def ensure_shared_demo_data():
     if not check_demo_products_exist():
         clean_demo_products()
         create_demo_products()
@@ -54,21 +123,62 @@ def ensure_demo_data(session_key):
         clean_demo_results()
         create_demo_results()
 
-    if not check_session_panel_exists(session_key):
-        clean_session_panel(session_key)
-        create_session_panel(session_key)
 
+def session_panels(session_key):
+    # a row per demo instance of the session, only a single one is valid
+    return list(Panel.objects.filter(sessions__session_key=session_key)[:2])
 
-def check_session_panel_exists(session_key):
-    items = DemoInstance.objects.filter(session_key=session_key)
-    if items.count() != 1:
-        return False
 
-    panels = Panel.objects.filter(sessions__in=items)
-    if panels.count() != 1:
-        return False
+def pooled_instances():
+    # pooled panels built for other demo objects than current ones are never handed out
+    return DemoInstance.objects.filter(
+        session_key=POOLED_SESSION_KEY,
+        panel__experiment_id=get_demo_param(DEMO_EXPERIMENT_KEY)
+    )
 
-    return True
+
+def claim_pooled_panel(session_key):
+    # a single UPDATE hands the oldest pooled panel to the session
+    for _ in range(POOL_CLAIM_ATTEMPTS):
+        pooled = pooled_instances().order_by('id').values('id')[:1]
+        if DemoInstance.objects.filter(id__in=pooled, session_key=POOLED_SESSION_KEY).update(
+                session_key=session_key,
+                created_at=timezone.now()
+        ):
+            return get_session_panel(session_key)
+        if not pooled_instances().exists():
+            return None
+    return None
+
+
+def lock_panel_pool():
+    # the row is made by a migration and locked until the transaction ends;
+    # SQLite has no row locks, a write takes the database lock there instead
+    if connection.features.has_select_for_update:
+        locked = list(DemoParam.objects.select_for_update().filter(key=DEMO_POOL_LOCK_KEY))
+    else:
+        locked = DemoParam.objects.filter(key=DEMO_POOL_LOCK_KEY).update(value='')
+    if not locked:
+        raise ImproperlyConfigured(f'DemoParam {DEMO_POOL_LOCK_KEY} is missing, run the demo migrations.')
+
+
+def fill_panel_pool(size=None):
+    # builds pooled panels until there are size of them, returns how many were added
+    if size is None:
+        size = getattr(settings, 'DEMO_PANEL_POOL_SIZE', DEFAULT_PANEL_POOL_SIZE)
+    ensure_demo_params()
+    stale = DemoInstance.objects.filter(session_key=POOLED_SESSION_KEY).exclude(id__in=pooled_instances())
+    purge_panels(stale.values_list('panel_id', flat=True))
+
+    added = 0
+    while True:
+        # counted again for every panel under the lock, other refills may be adding panels too
+        with transaction.atomic():
+            lock_panel_pool()
+            if pooled_instances().count() >= size:
+                return added
+            create_session_panel(POOLED_SESSION_KEY)
+        added += 1
 
 
 def clean_session_panel(session_key):
@@ -78,13 +188,36 @@ def clean_session_panel(session_key):
 
 
 def create_session_panel(session_key):
-    panel = Panel.objects.create(**get_demo_panel_data())
-    create_demo_panel_questions(panel)
+    # pooled panel is never seen without its questions or demo instance
+    with transaction.atomic():
+        panel = Panel.objects.create(**get_demo_panel_data())
+        create_demo_panel_questions(panel)
+
+        DemoInstance.objects.create(
+            session_key=session_key,
+            panel=panel
+        )
+    return panel
+
+
+def expired_session_panels(now=None):
+    now = now or timezone.now()
+    instances = DemoInstance.objects.exclude(session_key=POOLED_SESSION_KEY).order_by()
+    if settings.SESSION_ENGINE in DATABASE_SESSION_ENGINES:
+        instances = instances.filter(
+            ~Exists(Session.objects.filter(session_key=OuterRef('session_key'), expire_date__gt=now))
+        )
+    else:
+        instances = instances.filter(created_at__lt=now - timedelta(seconds=settings.SESSION_COOKIE_AGE))
+    return instances.values_list('panel_id', flat=True).distinct()
 
-    DemoInstance.objects.create(
-        session_key=session_key,
-        panel=panel
-    )
+
+def reap_expired_session_panels(batch_size=PURGE_BATCH_SIZE, now=None):
+    # deletes panels of expired demo sessions a batch per transaction, yields (panels, rows) deleted by each batch
+    now = now or timezone.now()
+    while panel_ids := list(expired_session_panels(now)[:batch_size]):
+        rows, deleted = purge_panels(panel_ids)
+        yield deleted.get(Panel._meta.label, 0), rows
 
 
 def check_scale_exists():
@@ -164,7 +297,7 @@ def create_demo_results():
 def create_demo_panel_questions(panel):
     status = panel.status
     panel.status = Panel.PanelStatus.PLANNED
-    scale = Scale.objects.get(id=DemoParam.objects.get(key=DEMO_SCALE_ABC_KEY).value)
+    scale_id = get_demo_param(DEMO_SCALE_ABC_KEY)
     questions = (
         'Which product do you prefer overall?',
         'Which product tastes more acidic?',
@@ -175,7 +308,7 @@ def create_demo_panel_questions(panel):
             panel=panel,
             order=idx,
             question_text=question,
-            scale=scale
+            scale_id=scale_id
         )
     panel.status = status
 
@@ -183,11 +316,7 @@ def create_demo_panel_questions(panel):
 def get_demo_panel_data(key=None):
     if key == DEMO_PANEL_RESULTS_SIGNIFICANT_KEY:
         return {
-            'experiment': Experiment.objects.get(
-                id=DemoParam.objects.get(
-                    key=DEMO_EXPERIMENT_KEY
-                ).value
-            ),
+            'experiment_id': get_demo_param(DEMO_EXPERIMENT_KEY),
             'description': 'Demo panel with results showing significant difference between products',
             'planned_panelists': 30,
             'status': Panel.PanelStatus.PRESENTING_RESULTS
@@ -195,11 +324,7 @@ def get_demo_panel_data(key=None):
 
     if key == DEMO_PANEL_RESULTS_INDISTINGUISHABLE_KEY:
         return {
-            'experiment': Experiment.objects.get(
-                id=DemoParam.objects.get(
-                    key=DEMO_EXPERIMENT_KEY
-                ).value
-            ),
+            'experiment_id': get_demo_param(DEMO_EXPERIMENT_KEY),
             'description': 'Demo panel with results showing no difference between products',
             'planned_panelists': 30,
             'status': Panel.PanelStatus.PRESENTING_RESULTS
@@ -207,11 +332,7 @@ def get_demo_panel_data(key=None):
 
     # else return data for panel created per user session
     return {
-        'experiment': Experiment.objects.get(
-            id=DemoParam.objects.get(
-                key=DEMO_EXPERIMENT_KEY
-            ).value
-        ),
+        'experiment_id': get_demo_param(DEMO_EXPERIMENT_KEY),
         'description': 'Panel created for demo purposes',
         'planned_panelists': 10
     }
@@ -316,40 +437,71 @@ def create_demo_products():
     )
 
 
-def get_odd_sample(sample_set, probability=0.33):
-    samples = Sample.objects.filter(sample_set=sample_set)
-    odd_product = (
-        samples
-        .values('product_id')
-        .annotate(cnt=Count('product_id'))
-        .filter(cnt=1)
-        .values_list('product_id', flat=True)[0]
-    )
-    a = (samples.filter(product_id=odd_product).first(), samples.exclude(product_id=odd_product).first())
-    p = (probability, 1 - probability)
-    return choice(a, p=p)
-
+def create_panel_results(panel, probability_correct=0.33, probabilities=(0.4, 0.2, 0.4), seed=None):
+    # simulates answers of all free sample sets of the panel at once: one draw per panel, bulk inserts
+    # numpy is imported only when results are generated, not on every demo page
+    import numpy as np
 
-def create_panel_results(panel, probability_correct=0.33, probabilities=(0.4, 0.2, 0.4)):
+    rng = np.random.default_rng(seed)
     scale_points = list(
         ScalePoint.objects.filter(
-            scale__id=DemoParam.objects.get(
-                key=DEMO_SCALE_ABC_KEY
-            ).value
+            scale_id=get_demo_param(DEMO_SCALE_ABC_KEY)
         ).values_list('code', 'text')
     )
-
-    for sample_set in SampleSet.objects.filter(panel=panel).filter(is_used=False):
-        result = Result.objects.create(
-            sample_set=sample_set,
-            odd_sample=get_odd_sample(sample_set, probability_correct)
+    questions = list(PanelQuestion.objects.filter(panel=panel).values_list('id', flat=True))
+
+    with transaction.atomic():
+        # sets generated before odd sample was stored
+        for sample_set in SampleSet.objects.filter(panel=panel, is_used=False, odd_sample__isnull=True):
+            sample_set.get_odd_sample_id()
+        sample_sets = list(
+            SampleSet.objects
+            .select_for_update()
+            .filter(panel=panel, is_used=False)
+            .order_by('id')
+            .values_list('id', 'odd_sample_id')
         )
-        for question in PanelQuestion.objects.filter(panel=panel):
-            answer_code, answer_text = scale_points[choice(len(scale_points), p=probabilities)]
-            Answer.objects.create(
-                question=question,
-                result=result,
-                answer_code=answer_code,
-                answer_text=answer_text
-            )
-
+        if not sample_sets:
+            return
+        # any of the two other samples is a wrong answer
+        other_samples = {}
+        for sample_set_id, sample_id in (
+                Sample.objects
+                .filter(panel=panel, sample_set__is_used=False)
+                .exclude(id=F('sample_set__odd_sample_id'))
+                .order_by()
+                .values_list('sample_set_id', 'id')
+        ):
+            other_samples.setdefault(sample_set_id, sample_id)
+
+        correct = rng.random(len(sample_sets)) < probability_correct
+        answers = rng.choice(len(scale_points), size=(len(sample_sets), len(questions)), p=probabilities)
+
+        SampleSet.objects.filter(panel=panel, is_used=False).update(is_used=True)
+        results = Result.objects.bulk_create(
+            [
+                Result(
+                    sample_set_id=sample_set_id,
+                    odd_sample_id=odd_sample_id if is_correct else other_samples[sample_set_id],
+                    is_correct=bool(is_correct)
+                )
+                for (sample_set_id, odd_sample_id), is_correct in zip(sample_sets, correct)
+            ],
+            batch_size=SAMPLES_BATCH_SIZE
+        )
+        Answer.objects.bulk_create(
+            [
+                Answer(
+                    question_id=question_id,
+                    result=result,
+                    answer_code=scale_points[point][0],
+                    answer_text=scale_points[point][1]
+                )
+                for result, result_answers in zip(results, answers)
+                for question_id, point in zip(questions, result_answers)
+            ],
+            batch_size=SAMPLES_BATCH_SIZE
+        )
+        # bulk inserts send no signals
+        Panel.bump_results_version(id=panel.id)
+        notify_results_changed(panel.id)
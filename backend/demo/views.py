@@ -15,14 +15,14 @@ class IndexView(TemplateView):
         if not request.session or not request.session.session_key:
             request.session.save()
         # check and create demo data for session
-        ensure_demo_data(request.session.session_key)
+        self.panel = ensure_demo_data(request.session.session_key)
         return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['result_significant_id'] = get_significant_result_id()
         context['result_indistinguishable_id'] = get_indistinguishable_result_id()
-        context['panel'] = get_session_panel(self.request.session.session_key)
+        context['panel'] = self.panel
         sample_sets = SampleSet.objects.filter(panel=context['panel']).filter(is_used=False)
         context['sample_set'] = Sample.objects.filter(
             sample_set=sample_sets.first()
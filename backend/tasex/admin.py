@@ -1,9 +1,32 @@
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
 from django.utils.safestring import mark_safe
 
 from .forms import ExperimentForm, PanelFormAdd, PanelFormChange
 from .models import (Experiment, Panel, Product, SampleSet, Sample, Result, Scale, ScalePoint,
                      Question, QuestionSet, PanelQuestion, Answer)
+from .context import forget_panel_status
+from .purge import reset_panels
+from .signals import panel_results_changed
+
+
+class ResultsDeleteAdminMixin:
+    # deleting these deletes results or answers, which send no delete signals
+    panel_lookup = 'panel_id'
+
+    def deleted_panel_ids(self, queryset):
+        return list(queryset.order_by().values_list(self.panel_lookup, flat=True).distinct())
+
+    def delete_model(self, request, obj):
+        panel_ids = self.deleted_panel_ids(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        panel_results_changed(panel_ids)
+
+    def delete_queryset(self, request, queryset):
+        panel_ids = self.deleted_panel_ids(queryset)
+        super().delete_queryset(request, queryset)
+        panel_results_changed(panel_ids)
 
 
 @admin.register(Experiment)
@@ -55,6 +78,7 @@ class PanelAdmin(admin.ModelAdmin):
         '-closed_at',
         '-created_at',
     )
+    actions = ('rerun_panels',)
 
     @staticmethod
     def temp_gui(obj):
@@ -99,6 +123,52 @@ class PanelAdmin(admin.ModelAdmin):
 
         super().save_model(request, obj, form, change)
 
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        # answers of questions deleted in the inline went with them
+        if formset.model is PanelQuestion and formset.deleted_objects:
+            panel_results_changed([form.instance.id])
+
+    def has_rerun_permission(self, request):
+        # results and answers of the panels are deleted
+        return (
+            self.has_change_permission(request)
+            and request.user.has_perm('tasex.delete_result')
+            and request.user.has_perm('tasex.delete_answer')
+        )
+
+    @admin.action(
+        description='Re-run selected panels (delete their results and answers)',
+        permissions=('rerun',)
+    )
+    def rerun_panels(self, request, queryset):
+        if not request.POST.get('post'):
+            return TemplateResponse(request, 'admin/tasex/panel/rerun_confirmation.html', {
+                **self.admin_site.each_context(request),
+                'title': 'Are you sure?',
+                'opts': self.model._meta,
+                'queryset': queryset,
+                'results': Result.objects.filter(sample_set__panel__in=queryset).count(),
+                'answers': Answer.objects.filter(question__panel__in=queryset).count(),
+                'status': Panel.PanelStatus.PLANNED.label,
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+                'media': self.media,
+            })
+
+        panel_ids = list(queryset.values_list('id', flat=True))
+        # planned first, so tasters of a running panel can't add results while it's reset;
+        # started again by the owner, questions may be changed before that
+        Panel.objects.filter(id__in=panel_ids).update(status=Panel.PanelStatus.PLANNED, closed_at=None)
+        for panel_id in panel_ids:
+            forget_panel_status(panel_id)
+        # done in the database, a batch of results at a time
+        _, deleted = reset_panels(panel_ids)
+        self.message_user(
+            request,
+            f'Deleted {deleted[Result._meta.label]} results and {deleted[Answer._meta.label]} answers '
+            f'of {len(panel_ids)} panels, all their sample sets are free again and the panels are planned.'
+        )
+
 
 class QuestionInQuestionSetAdmin(admin.TabularInline):
     model = QuestionSet.questions.through
@@ -116,12 +186,12 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(SampleSet)
-class SampleSetAdmin(admin.ModelAdmin):
+class SampleSetAdmin(ResultsDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('__str__', 'panel', 'is_used')
 
 
 @admin.register(Sample)
-class SampleAdmin(admin.ModelAdmin):
+class SampleAdmin(ResultsDeleteAdminMixin, admin.ModelAdmin):
     list_display = (
         '__str__',
         'sample_set',
@@ -133,7 +203,8 @@ class SampleAdmin(admin.ModelAdmin):
 
 
 @admin.register(Result)
-class ResultAdmin(admin.ModelAdmin):
+class ResultAdmin(ResultsDeleteAdminMixin, admin.ModelAdmin):
+    panel_lookup = 'sample_set__panel_id'
     list_display = (
         '__str__',
         'sample_set',
@@ -168,12 +239,17 @@ class QuestionAdmin(admin.ModelAdmin):
 
 
 @admin.register(PanelQuestion)
-class PanelQuestionAdmin(admin.ModelAdmin):
+class PanelQuestionAdmin(ResultsDeleteAdminMixin, admin.ModelAdmin):
     pass
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
-    pass
+class AnswerAdmin(ResultsDeleteAdminMixin, admin.ModelAdmin):
+    panel_lookup = 'question__panel_id'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # saved answers send no signals either
+        panel_results_changed(self.deleted_panel_ids(Answer.objects.filter(pk=obj.pk)))
 # for debug: check session data in admin module
 from django.contrib.sessions.models import Session
 
@@ -5,3 +5,6 @@ class TasexConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasex'
     verbose_name = 'Tasting Experiments'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,46 @@
+import json
+import threading
+
+from django.core.cache import cache
+
+from .results import summarize_panel, summarize_survey
+from .svg import chart_json, pie_chart
+from .utils import PanelResult, SurveyPlots, render_pie_chart
+
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
+# format: (renderer, content type), PNG is rendered with matplotlib for high resolution exports
+CHART_FORMATS = {
+    'svg': (lambda data: pie_chart(data).encode(), 'image/svg+xml'),
+    'json': (lambda data: json.dumps(chart_json(data)).encode(), 'application/json'),
+    'png': (render_pie_chart, 'image/png'),
+}
+# pyplot is not thread safe, it also makes concurrent requests for the same chart wait for one rendering
+_render_lock = threading.Lock()
+
+
+def chart_cache_key(panel, name, chart_format):
+    return f'tasex:chart:{panel.id}:{panel.results_version}:{name}.{chart_format}'
+
+
+def get_chart_data(panel, name):
+    if name == PanelResult.chart_name:
+        return PanelResult(summarize_panel(panel)).chart
+    return SurveyPlots(summarize_survey(panel)).charts.get(name)
+
+
+def get_chart(panel, name, chart_format='svg'):
+    # returns chart rendered once per results version of the panel, None for unknown chart
+    key = chart_cache_key(panel, name, chart_format)
+    chart = cache.get(key)
+    if chart is not None:
+        return chart
+    with _render_lock:
+        chart = cache.get(key)
+        if chart is None:
+            data = get_chart_data(panel, name)
+            if data is None:
+                return None
+            render, _ = CHART_FORMATS[chart_format]
+            chart = render(data)
+            cache.set(key, chart, CHART_CACHE_TIMEOUT)
+    return chart
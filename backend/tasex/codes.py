@@ -0,0 +1,124 @@
+from random import sample
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.utils.module_loading import import_string
+
+DEFAULT_SAMPLE_CODES = {
+    'ALLOCATOR': 'tasex.codes.CodeAllocator',
+    'LENGTH': 4,
+    'CHECK_DIGIT': False,
+    'UNIQUE': 'panel',
+    'MAX_FILL': 1.0,
+}
+# codes are stored in Sample.code, which allows up to 10 characters (check digit included)
+MAX_CODE_LENGTH = 9
+
+UNIQUE_PER_PANEL = 'panel'
+# codes unique across all panels that may still be tasted (planned or accepting answers)
+UNIQUE_PER_SITE = 'site'
+
+
+def luhn_check_digit(digits):
+    total = 0
+    # rightmost digit of the payload is doubled, as the check digit will be appended after it
+    for idx, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if idx % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+# Hands out blind codes for samples.
+# The pool of available codes is the range of all numbers with `length` digits (no leading zeros),
+# so it is never materialized - drawing `count` codes with `random.sample` costs O(count).
+# If the pool is too small for the requested amount, the next longer code length is used.
+class CodeAllocator:
+    def __init__(self, length=4, check_digit=False, unique=UNIQUE_PER_PANEL, max_fill=1.0):
+        if not 1 <= length <= MAX_CODE_LENGTH:
+            raise ImproperlyConfigured(f'Sample code length must be between 1 and {MAX_CODE_LENGTH}')
+        if unique not in (UNIQUE_PER_PANEL, UNIQUE_PER_SITE):
+            raise ImproperlyConfigured(f'Unknown sample code uniqueness "{unique}"')
+        if not 0 < max_fill <= 1:
+            raise ImproperlyConfigured('Sample code max fill must be in (0, 1]')
+        self.length = length
+        self.check_digit = check_digit
+        self.unique = unique
+        self.max_fill = max_fill
+
+    @staticmethod
+    def pool(length):
+        return range(10 ** (length - 1), 10 ** length)
+
+    def pool_length(self, needed):
+        # shortest code length with enough room for the needed codes
+        for length in range(self.length, MAX_CODE_LENGTH + 1):
+            if len(self.pool(length)) * self.max_fill >= needed:
+                return length
+        raise ValidationError(f'Cannot generate {needed} unique sample codes')
+
+    def reserved_codes(self, panel=None):
+        if self.unique != UNIQUE_PER_SITE:
+            return set()
+        from .models import Panel, Sample
+
+        reserved = (
+            Sample.objects
+            .filter(panel__status__in=(Panel.PanelStatus.PLANNED, Panel.PanelStatus.ACCEPTING_ANSWERS))
+        )
+        if panel is not None:
+            reserved = reserved.exclude(panel=panel)
+        return set(reserved.values_list('code', flat=True))
+
+    def lock(self):
+        # site wide codes are drawn by one new panel at a time, the lock is held until its transaction ends
+        if self.unique != UNIQUE_PER_SITE:
+            return
+        from .models import SampleCodeLock
+
+        SampleCodeLock.objects.get_or_create(id=SampleCodeLock.ID)
+        if connection.features.has_select_for_update:
+            list(SampleCodeLock.objects.select_for_update().filter(id=SampleCodeLock.ID))
+        else:
+            # SQLite has no row locks, a write takes the database lock instead
+            SampleCodeLock.objects.filter(id=SampleCodeLock.ID).update(id=SampleCodeLock.ID)
+
+    def encode(self, number):
+        code = str(number)
+        if self.check_digit:
+            code += luhn_check_digit(code)
+        return code
+
+    def allocate(self, count, panel=None):
+        reserved = self.reserved_codes(panel)
+        length = self.pool_length(count + len(reserved))
+        pool = self.pool(length)
+        # draw extra codes to make up for the ones reserved by other panels
+        clashing = sum(1 for code in reserved if len(code) == length + self.check_digit)
+        codes = [
+            code
+            for code in map(self.encode, sample(pool, count + clashing))
+            if code not in reserved
+        ]
+        return codes[:count]
+
+    def is_valid(self, code, check_digit=None):
+        # codes of a panel are checked the way they were drawn, whatever the setting is now
+        if check_digit is None:
+            check_digit = self.check_digit
+        code = str(code)
+        if not code.isdigit():
+            return False
+        if check_digit:
+            return len(code) > 1 and luhn_check_digit(code[:-1]) == code[-1]
+        return True
+
+
+def get_code_allocator():
+    config = DEFAULT_SAMPLE_CODES | getattr(settings, 'TASEX_SAMPLE_CODES', {})
+    allocator_class = import_string(config.pop('ALLOCATOR'))
+    return allocator_class(**{key.lower(): value for key, value in config.items()})
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+from uuid import UUID
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+from .models import Panel
+
+# seconds a worker trusts a panel status it has already seen,
+# status changed by another worker is noticed at the latest after this time
+DEFAULT_PANEL_STATUS_TTL = 5
+# the least recently remembered statuses are dropped once the cache grows over this size
+PANEL_STATUS_CACHE_SIZE = 1024
+
+# panel id: (status, expires at, code check digit), kept per process and shared by its threads
+_panel_statuses = OrderedDict()
+_panel_statuses_lock = threading.Lock()
+
+
+def _status_key(panel_id):
+    # the same panel comes as UUID, in canonical form or as hex from URLs
+    try:
+        return str(UUID(str(panel_id)))
+    except ValueError:
+        return str(panel_id)
+
+
+def remember_panel_status(panel_id, status, code_check_digit=None):
+    ttl = getattr(settings, 'TASEX_PANEL_STATUS_TTL', DEFAULT_PANEL_STATUS_TTL)
+    if ttl <= 0:
+        return
+    key = _status_key(panel_id)
+    with _panel_statuses_lock:
+        _panel_statuses[key] = (status, monotonic() + ttl, code_check_digit)
+        _panel_statuses.move_to_end(key)
+        while len(_panel_statuses) > PANEL_STATUS_CACHE_SIZE:
+            _panel_statuses.popitem(last=False)
+
+
+def forget_panel_status(panel_id):
+    with _panel_statuses_lock:
+        _panel_statuses.pop(_status_key(panel_id), None)
+
+
+def _cached_panel(panel_id):
+    cached = _panel_statuses.get(_status_key(panel_id))
+    if cached and cached[1] > monotonic():
+        return cached
+    return None
+
+
+def cached_panel_status(panel_id):
+    cached = _cached_panel(panel_id)
+    return cached[0] if cached else None
+
+
+def cached_code_check_digit(panel_id):
+    cached = _cached_panel(panel_id)
+    return cached[2] if cached else None
+
+
+# Panel of the current request, loaded at most once and shared by the views it is delegated to
+class PanelContext:
+    def __init__(self, panel_id):
+        self.panel_id = str(panel_id)
+
+    @cached_property
+    def panel(self):
+        panel = get_object_or_404(
+            Panel.objects.select_related('experiment__product_A', 'experiment__product_B'),
+            id=self.panel_id
+        )
+        remember_panel_status(self.panel_id, panel.status, panel.code_check_digit)
+        return panel
+
+    @property
+    def status(self):
+        # answered without a query when the panel is loaded already or its status is cached
+        if 'panel' not in self.__dict__:
+            status = cached_panel_status(self.panel_id)
+            if status is not None:
+                return status
+        return self.panel.status
+
+    @property
+    def code_check_digit(self):
+        # set once the samples are drawn, cached along with the status
+        if 'panel' not in self.__dict__:
+            check_digit = cached_code_check_digit(self.panel_id)
+            if check_digit is not None:
+                return check_digit
+        return self.panel.code_check_digit
+
+
+def get_panel_context(request, panel_id):
+    context = getattr(request, '_panel_context', None)
+    if context is None or context.panel_id != str(panel_id):
+        context = request._panel_context = PanelContext(panel_id)
+    return context
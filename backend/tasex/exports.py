@@ -0,0 +1,211 @@
+import csv
+import json
+from itertools import islice
+
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank, RowNumber
+from django.utils.html import escape
+
+from .models import Sample, Result
+
+# rows fetched from the database and sent to the client at once
+EXPORT_CHUNK_SIZE = 2000
+LABELS_PER_PAGE = 30
+# layout: ordering of the samples, trays for serving sets, products for pouring one product after another
+PREP_LAYOUTS = {
+    'trays': ('tray', 'position'),
+    'products': ('product__brew_id', 'tray', 'position'),
+}
+
+
+def chunked(iterable, size=EXPORT_CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def prep_sheet_rows(panel_id, layout='trays'):
+    # (tray, position, product brew id, code) of every sample in the panel, from a single ordered query
+    return (
+        Sample.objects
+        .filter(panel_id=panel_id)
+        .annotate(
+            tray=Window(DenseRank(), order_by=F('sample_set_id').asc()),
+            position=Window(RowNumber(), partition_by=F('sample_set_id'), order_by=F('code').asc()),
+        )
+        .order_by(*PREP_LAYOUTS[layout])
+        .values_list('tray', 'position', 'product__brew_id', 'code')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+class Echo:
+    # file-like object handing csv.writer output back instead of storing it
+    def write(self, value):
+        return value
+
+
+def prep_sheet_csv(panel, layout):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('tray', 'position', 'product', 'code'))
+    for rows in chunked(prep_sheet_rows(panel.id, layout)):
+        yield ''.join(writer.writerow(row) for row in rows)
+
+
+LABELS_HEAD = '''<!DOCTYPE html>
+<html lang="en"><head><meta charset="UTF-8"><title>{title}</title>
+<style>
+    body {{ font-family: sans-serif; margin: 0; }}
+    .sheet {{ display: grid; grid-template-columns: repeat(3, 1fr); gap: 2mm; padding: 5mm; }}
+    .sheet h4 {{ grid-column: 1 / -1; margin: 0; }}
+    .label {{ border: 1px dashed #999; padding: 2mm; text-align: center; }}
+    .label .code {{ font-size: 20pt; font-weight: bold; }}
+    .label .tray {{ font-size: 8pt; }}
+    @media print {{ .sheet {{ page-break-after: always; }} }}
+</style></head><body>
+'''
+
+
+def prep_sheet_labels(panel, layout):
+    # cup labels, a printed page per LABELS_PER_PAGE labels, in products layout a product starts a new page
+    yield LABELS_HEAD.format(title=escape(panel.description))
+    page, page_product = [], None
+    for tray, position, product, code in prep_sheet_rows(panel.id, layout):
+        if page and (len(page) == LABELS_PER_PAGE or (layout == 'products' and product != page_product)):
+            yield _labels_page(panel, page_product if layout == 'products' else None, page)
+            page = []
+        page_product = product
+        page.append(
+            f'<div class="label"><div class="code">{escape(code)}</div>'
+            f'<div class="tray">{tray} / {position}</div></div>'
+        )
+    if page:
+        yield _labels_page(panel, page_product if layout == 'products' else None, page)
+    yield '</body></html>\n'
+
+
+def _labels_page(panel, product, labels):
+    title = escape(panel.description) + (f' - {escape(product)}' if product else '')
+    return f'<div class="sheet"><h4>{title}</h4>{"".join(labels)}</div>\n'
+
+
+# format: (renderer, content type)
+PREP_SHEET_FORMATS = {
+    'csv': (prep_sheet_csv, 'text/csv'),
+    'html': (prep_sheet_labels, 'text/html'),
+}
+
+
+# column: field of Result, one row per answer, results without answers get a single row with empty answer
+RESULT_COLUMNS = {
+    'experiment': 'sample_set__panel__experiment_id',
+    'panel': 'sample_set__panel_id',
+    'result': 'id',
+    'sample_set': 'sample_set_id',
+    'odd_sample': 'sample_set__odd_sample__code',
+    'odd_product': 'sample_set__odd_product__brew_id',
+    'chosen_sample': 'odd_sample__code',
+    'chosen_product': 'odd_sample__product__brew_id',
+    'is_correct': 'is_correct',
+    'question_order': 'answers__question__order',
+    'question': 'answers__question__question_text',
+    'answer_code': 'answers__answer_code',
+    'answer_text': 'answers__answer_text',
+}
+
+
+def result_rows(panel_id=None, experiment_id=None):
+    # a single query read with a server-side cursor where the database has one, memory does not grow with results
+    results = Result.objects.all()
+    if panel_id is not None:
+        results = results.filter(sample_set__panel_id=panel_id)
+    if experiment_id is not None:
+        results = results.filter(sample_set__panel__experiment_id=experiment_id)
+    return (
+        results
+        .order_by('sample_set__panel__created_at', 'sample_set__panel_id', 'id', 'answers__question__order')
+        .values_list(*RESULT_COLUMNS.values())
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def results_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(RESULT_COLUMNS)
+    for chunk in chunked(rows):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def results_jsonl(rows):
+    for chunk in chunked(rows):
+        yield ''.join(json.dumps(dict(zip(RESULT_COLUMNS, row)), default=str) + '\n' for row in chunk)
+
+
+class ParquetSink:
+    # file-like object collecting what pyarrow writes, emptied after every row group
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def results_parquet(rows):
+    # pyarrow is an optional dependency, needed only for this format
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (column, pa.int64() if column in ('result', 'sample_set', 'question_order')
+         else pa.bool_() if column == 'is_correct' else pa.string())
+        for column in RESULT_COLUMNS
+    ])
+    sink = ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for chunk in chunked(rows):
+        columns = [
+            pa.array(
+                [str(value) if value is not None and field.type == pa.string() else value for value in values],
+                type=field.type
+            )
+            for field, values in zip(schema, zip(*chunk))
+        ]
+        # one row group per chunk
+        writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# format: (renderer, content type, binary)
+RESULT_FORMATS = {
+    'csv': (results_csv, 'text/csv', False),
+    'jsonl': (results_jsonl, 'application/x-ndjson', False),
+    'parquet': (results_parquet, 'application/vnd.apache.parquet', True),
+}
@@ -0,0 +1,27 @@
+import django_filters
+
+from .models import Experiment, Panel
+
+
+class ExperimentFilter(django_filters.FilterSet):
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+
+    class Meta:
+        model = Experiment
+        fields = ('question_set',)
+
+
+class PanelFilter(django_filters.FilterSet):
+    # ?status=PLANNED&status=ACCEPTING_ANSWERS gives panels in any of the statuses
+    status = django_filters.MultipleChoiceFilter(choices=Panel.PanelStatus.choices)
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+    modified_after = django_filters.IsoDateTimeFilter(field_name='modified_at', lookup_expr='gte')
+    modified_before = django_filters.IsoDateTimeFilter(field_name='modified_at', lookup_expr='lte')
+    closed_after = django_filters.IsoDateTimeFilter(field_name='closed_at', lookup_expr='gte')
+    closed_before = django_filters.IsoDateTimeFilter(field_name='closed_at', lookup_expr='lt')
+
+    class Meta:
+        model = Panel
+        fields = ('experiment', 'status')
@@ -2,6 +2,8 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.safestring import mark_safe
 
+from .codes import get_code_allocator
+from .context import PanelContext
 from .models import Product, Experiment, Panel, Sample, PanelQuestion
 from .widgets import VerticalButtonSelect
 
@@ -54,28 +56,24 @@ class PanelFormChange(forms.ModelForm):
 
 class PanelQuestionsForm(forms.Form):
     def __init__(self, *args, **kwargs):
+        # questions should come with prefetched scale points
         questions = kwargs.pop('questions', PanelQuestion.objects.none())
         super().__init__(*args, **kwargs)
         for question in questions:
-            self.fields[question.id] = forms.ChoiceField(
+            self.fields[str(question.id)] = forms.ChoiceField(
                 required=True,
-                choices=question.scale.points.values_list('code', 'text'),
+                choices=[(point.code, point.text) for point in question.scale.points.all()],
                 # widget=forms.RadioSelect,
                 widget=VerticalButtonSelect,
                 label=question.question_text
             )
 
-    def clean(self):
-        for question in self.fields:
-            answer = self.data.get(str(question))
-            if answer and answer in PanelQuestion.objects.get(id=question).scale.points.values_list('code', flat=True):
-                self.errors.pop(question)
-        return self.data
-
 
 class GenericPanelForm(forms.Form):
     def __init__(self, **kwargs):
         self.panel_state = kwargs.pop('panel_state')
+        # panel of the request, loaded only if a form needs more than its id
+        self.panel_context = kwargs.pop('panel_context', None) or PanelContext(self.panel_state.panel_id)
         super().__init__(**kwargs)
 
 
@@ -86,15 +84,19 @@ class SingleSampleForm(GenericPanelForm):
 
     def clean_code(self):
         data = self.cleaned_data["code"]
-        sample = Sample.objects.filter(code=data).filter(sample_set__panel_id=self.panel_state.panel_id)
+        # mistyped codes are rejected without hitting the database, once the panel is cached
+        if not get_code_allocator().is_valid(data, check_digit=self.panel_context.code_check_digit):
+            raise ValidationError('Nie ma takiego numeru próbki')
+        sample = Sample.find(self.panel_state.panel_id, data)
 
-        if not sample.exists():
+        if sample is None:
             raise ValidationError('Nie ma takiego numeru próbki')
 
-        if not sample.filter(sample_set__is_used=False).exists():
+        sample_set_id, is_used = sample
+        if is_used:
             raise ValidationError('Ten numer próbki został już wykorzystany')
 
-        self.cleaned_data["sample_set_id"] = sample.values_list('sample_set_id')[0][0]
+        self.cleaned_data["sample_set_id"] = sample_set_id
 
         return data
 
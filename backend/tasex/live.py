@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .results import summarize_panel, summarize_survey
+
+DEFAULT_LIVE_BROKER = 'tasex.live.LocalBroker'
+# comment line sent when nothing happened, so proxies do not close the idle connection
+KEEPALIVE_SECONDS = 15
+# how soon the browser reconnects, without ASGI this is how often the dashboard refreshes
+RETRY_MILLISECONDS = 5000
+# Django does not notice a browser that went away, a stream ends after this long and the browser reconnects
+STREAM_LIFETIME_SECONDS = 5 * 60
+
+
+def panel_channel(panel_id):
+    return f'tasex.panel.{panel_id}'
+
+
+class Subscription:
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        # holds one pending message at most, a burst of results is coalesced into a single refresh
+        self.queue = asyncio.Queue(maxsize=1)
+
+    def deliver(self, message):
+        # called from any thread
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # event loop of the stream is gone
+            self.close()
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# Publish/subscribe within one process, stands in for a message broker when one server process serves the app
+class LocalBroker:
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+
+_broker = None
+
+
+def get_live_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'TASEX_LIVE_BROKER', DEFAULT_LIVE_BROKER))()
+    return _broker
+
+
+def notify_results_changed(panel_id):
+    # subscribers are told only once the new results are visible to their queries
+    panel_id = str(panel_id)
+    transaction.on_commit(lambda: get_live_broker().publish(panel_channel(panel_id), panel_id))
+
+
+def live_results(panel):
+    summary = summarize_panel(panel)
+    data = summary.as_dict()
+    data['questions'] = [
+        {
+            'id': question.question_id,
+            'text': question.question_text,
+            'answers': {code: count for code, _, count in question.points},
+        }
+        for question in summarize_survey(panel)
+    ]
+    return data
+
+
+def results_event(panel):
+    return f'event: results\ndata: {json.dumps(live_results(panel))}\n\n'
+
+
+async def results_stream(panel):
+    # queries run only when results of the panel change, never on a timer
+    subscription = get_live_broker().subscribe(panel_channel(panel.id))
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n'
+        yield await sync_to_async(results_event)(panel)
+        ends_at = time.monotonic() + STREAM_LIFETIME_SECONDS
+        while (remaining := ends_at - time.monotonic()) > 0:
+            try:
+                await subscription.get(min(KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield await sync_to_async(results_event)(panel)
+    finally:
+        subscription.close()
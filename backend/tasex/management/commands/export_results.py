@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...exports import RESULT_FORMATS, parquet_available, result_rows
+
+
+class Command(BaseCommand):
+    help = 'Exports results with answers of a panel, an experiment or all of them, one row per answer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--panel', help='id of the panel')
+        parser.add_argument('--experiment', help='id of the experiment')
+        parser.add_argument('--format', choices=RESULT_FORMATS, default='csv')
+        parser.add_argument('--output', help='file to write to, standard output by default')
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        render, _, binary = RESULT_FORMATS[export_format]
+        if export_format == 'parquet' and not parquet_available():
+            raise CommandError('Parquet export needs pyarrow, install it with "pip install pyarrow"')
+        if binary and not options['output']:
+            raise CommandError(f'{export_format} export needs --output file')
+
+        rows = result_rows(panel_id=options['panel'], experiment_id=options['experiment'])
+        if options['output']:
+            with open(options['output'], 'wb' if binary else 'w', newline=None if binary else '') as output:
+                for chunk in render(rows):
+                    output.write(chunk)
+        else:
+            for chunk in render(rows):
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0009_answer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sample',
+            name='code',
+            field=models.CharField(max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(fields=['code'], name='tasex_sampl_code_9380e9_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_odd_samples(apps, schema_editor):
+    SampleSet = apps.get_model('tasex', 'SampleSet')
+    Sample = apps.get_model('tasex', 'Sample')
+    sample_sets = []
+    for sample_set in SampleSet.objects.filter(odd_sample__isnull=True).iterator():
+        samples = list(Sample.objects.filter(sample_set=sample_set).values_list('id', 'product_id'))
+        products = [product_id for _, product_id in samples]
+        odd = [(sample_id, product_id) for sample_id, product_id in samples if products.count(product_id) == 1]
+        if len(odd) != 1:
+            continue
+        sample_set.odd_sample_id, sample_set.odd_product_id = odd[0]
+        sample_sets.append(sample_set)
+    SampleSet.objects.bulk_update(sample_sets, ('odd_sample', 'odd_product'), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0010_sample_code_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sampleset',
+            name='odd_product',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tasex.product'),
+        ),
+        migrations.AddField(
+            model_name='sampleset',
+            name='odd_sample',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tasex.sample'),
+        ),
+        migrations.RunPython(fill_odd_samples, migrations.RunPython.noop),
+    ]
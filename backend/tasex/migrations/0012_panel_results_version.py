@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0011_sampleset_odd_sample'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='panel',
+            name='results_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0012_panel_results_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sampleset',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+def delete_duplicate_answers(apps, schema_editor):
+    Answer = apps.get_model('tasex', 'Answer')
+    duplicates = (
+        Answer.objects
+        .values('result_id', 'question_id')
+        .annotate(keep=models.Min('id'), cnt=models.Count('id'))
+        .filter(cnt__gt=1)
+    )
+    for duplicate in duplicates:
+        (Answer.objects
+         .filter(result_id=duplicate['result_id'], question_id=duplicate['question_id'])
+         .exclude(id=duplicate['keep'])
+         .delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0013_sampleset_claim_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('result', 'question'), name='unique_answer_per_result'),
+        ),
+    ]
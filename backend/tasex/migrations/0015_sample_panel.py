@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0014_answer_unique_per_result'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sample',
+            name='panel',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='tasex.panel'),
+        ),
+    ]
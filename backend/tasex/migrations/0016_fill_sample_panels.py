@@ -0,0 +1,25 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+def fill_sample_panels(apps, schema_editor):
+    Sample = apps.get_model('tasex', 'Sample')
+    SampleSet = apps.get_model('tasex', 'SampleSet')
+    Sample.objects.filter(panel__isnull=True).update(
+        panel_id=models.Subquery(
+            SampleSet.objects.filter(id=models.OuterRef('sample_set_id')).values('panel_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    # separate from the schema changes around it, PostgreSQL does not alter a table with pending trigger events
+
+    dependencies = [
+        ('tasex', '0015_sample_panel'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_sample_panels, migrations.RunPython.noop),
+    ]
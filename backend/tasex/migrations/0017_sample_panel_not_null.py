@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0016_fill_sample_panels'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sample',
+            name='panel',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='tasex.panel'),
+        ),
+        migrations.AddConstraint(
+            model_name='sample',
+            constraint=models.UniqueConstraint(fields=('panel', 'code'), name='unique_sample_code_per_panel'),
+        ),
+        # codes are always looked up within a panel, the unique constraint indexes them
+        migrations.RemoveIndex(
+            model_name='sample',
+            name='tasex_sampl_code_9380e9_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0017_sample_panel_not_null'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='panel',
+            index=models.Index(fields=['created_at'], name='tasex_panel_created_293232_idx'),
+        ),
+    ]
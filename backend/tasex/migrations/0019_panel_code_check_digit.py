@@ -0,0 +1,32 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_check_digit_panels(apps, schema_editor):
+    # codes of existing panels were drawn with the setting in place until now
+    if getattr(settings, 'TASEX_SAMPLE_CODES', {}).get('CHECK_DIGIT', False):
+        apps.get_model('tasex', 'Panel').objects.update(code_check_digit=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasex', '0018_panel_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SampleCodeLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='panel',
+            name='code_check_digit',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_check_digit_panels, migrations.RunPython.noop),
+    ]
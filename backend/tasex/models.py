@@ -1,10 +1,15 @@
-from random import sample, getrandbits
+from random import getrandbits
 from uuid import uuid4
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 
+from .codes import get_code_allocator
+
+# max rows sent in a single INSERT when generating samples for a panel
+SAMPLES_BATCH_SIZE = 1000
+
 
 class Product(models.Model):
     # TODO: change id to uuid
@@ -42,15 +47,90 @@ class Experiment(models.Model):
 class SampleSet(models.Model):
     panel = models.ForeignKey('Panel', on_delete=models.CASCADE, related_name='sample_sets')
     is_used = models.BooleanField(default=False)
+    # stored upon samples generation, so results are scored without aggregating samples
+    odd_sample = models.ForeignKey(
+        'Sample',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    odd_product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    # given to the panelist who claimed the set, kept in their session
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+
+    @staticmethod
+    def claim(sample_set_id):
+        # conditional update locks just this row, so only one of concurrent panelists gets the set
+        token = uuid4()
+        claimed = (
+            SampleSet.objects
+            .filter(id=sample_set_id, is_used=False)
+            .update(is_used=True, claim_token=token)
+        )
+        return str(token) if claimed else None
+
+    def get_odd_sample_id(self):
+        # sample sets created before odd sample was stored are resolved (and updated) on first use
+        if self.odd_sample_id is None:
+            self.odd_product_id = (
+                Sample.objects
+                .filter(sample_set=self)
+                .values('product_id')
+                .annotate(cnt=models.Count('product_id'))
+                .filter(cnt=1)
+                .values_list('product_id', flat=True)[0]
+            )
+            self.odd_sample_id = (
+                Sample.objects
+                .filter(sample_set=self)
+                .filter(product_id=self.odd_product_id)
+                .values_list('id', flat=True)[0]
+            )
+            SampleSet.objects.filter(id=self.id).update(
+                odd_sample_id=self.odd_sample_id,
+                odd_product_id=self.odd_product_id
+            )
+        return self.odd_sample_id
 
 
 class Sample(models.Model):
     sample_set = models.ForeignKey(SampleSet, on_delete=models.CASCADE, related_name='samples')
+    # copied from sample set, so entered code is found by a single unique index lookup
+    panel = models.ForeignKey('Panel', on_delete=models.CASCADE, related_name='samples', editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='samples')
-    code = models.CharField(max_length=5)
+    code = models.CharField(max_length=10)
 
     class Meta:
         ordering = ('code',)
+        # also the index codes are looked up with
+        constraints = (
+            models.UniqueConstraint(fields=('panel', 'code'), name='unique_sample_code_per_panel'),
+        )
+
+    @staticmethod
+    def find(panel_id, code):
+        # (sample set id, is sample set used) of the sample with this code in the panel, None if there is none
+        found = (
+            Sample.objects
+            .filter(panel_id=panel_id, code=str(code))
+            .order_by()
+            .values_list('sample_set_id', 'sample_set__is_used')[:1]
+        )
+        return found[0] if found else None
+
+    def save(self, *args, **kwargs):
+        if self.panel_id is None:
+            self.panel_id = self.sample_set.panel_id
+        super().save(*args, **kwargs)
 
 
 class Panel(models.Model):
@@ -85,10 +165,24 @@ class Panel(models.Model):
     closed_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+    # bumped whenever results or answers change, used to version cached result charts
+    results_version = models.PositiveIntegerField(default=0, editable=False)
+    # sample codes of the panel end with a check digit, as configured when they were drawn
+    code_check_digit = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = (
+            # API pages through panels by creation time
+            models.Index(fields=('created_at',)),
+        )
 
     def __str__(self):
         return self.description[:50]
 
+    @staticmethod
+    def bump_results_version(**filters):
+        Panel.objects.filter(**filters).update(results_version=models.F('results_version') + 1)
+
     def clean(self):
         if Panel.objects.filter(pk=self.pk).exists():
             orig = Panel.objects.get(pk=self.pk)
@@ -98,35 +192,66 @@ class Panel(models.Model):
     def save(self, *args, **kwargs):
         # Automatically creates samples for the panel upon it's creation
         if self._state.adding:
-            super().save(*args, **kwargs)
-            # generate random ids for all the samples
-            sample_codes = sample(range(1000, 10000), self.planned_panelists * 3)
-            # randomly decide how to assign samples to products
-            product_ids = [
-                self.experiment.product_A,
-                self.experiment.product_B
-            ]
-            if getrandbits(1):
-                product_ids.reverse()
-
-            for i in range(self.planned_panelists):
-                sample_set = SampleSet.objects.create(panel=self)
-                for j in range(3):
-                    Sample.objects.create(
-                        sample_set=sample_set,
-                        product=product_ids[(i + j) % 2],
-                        code=sample_codes[3 * i + j]
-                    )
+            allocator = get_code_allocator()
+            self.code_check_digit = allocator.check_digit
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.generate_samples(allocator)
         else:
             orig = Panel.objects.get(pk=self.pk)
             if self.planned_panelists != orig.planned_panelists:
                 raise ValidationError('Cannot change "planned_panelists" field')
             super().save(*args, **kwargs)
 
+    def generate_samples(self, allocator=None):
+        if allocator is None:
+            allocator = get_code_allocator()
+        # generate random ids for all the samples, other new panels wait if codes are unique site wide
+        allocator.lock()
+        sample_codes = allocator.allocate(self.planned_panelists * 3, panel=self)
+        # randomly decide how to assign samples to products
+        product_ids = [
+            self.experiment.product_A_id,
+            self.experiment.product_B_id
+        ]
+        if getrandbits(1):
+            product_ids.reverse()
+
+        # one INSERT for all the sets, backends returning ids on bulk insert give us pks for the samples
+        # in i-th set the samples get products i, i + 1, i + 2 (mod 2), so the middle one is the odd one
+        sample_sets = SampleSet.objects.bulk_create(
+            [
+                SampleSet(panel=self, odd_product_id=product_ids[(i + 1) % 2])
+                for i in range(self.planned_panelists)
+            ],
+            batch_size=SAMPLES_BATCH_SIZE
+        )
+        samples = Sample.objects.bulk_create(
+            [
+                Sample(
+                    sample_set=sample_set,
+                    panel=self,
+                    product_id=product_ids[(i + j) % 2],
+                    code=sample_codes[3 * i + j]
+                )
+                for i, sample_set in enumerate(sample_sets)
+                for j in range(3)
+            ],
+            batch_size=SAMPLES_BATCH_SIZE
+        )
+        for i, sample_set in enumerate(sample_sets):
+            sample_set.odd_sample = samples[3 * i + 1]
+        SampleSet.objects.bulk_update(sample_sets, ('odd_sample',), batch_size=SAMPLES_BATCH_SIZE)
+
     def get_absolute_url(self):
         return reverse('tasex:panel', kwargs={"pk": self.id})
 
 
+# Single row locked while a new panel draws sample codes unique across the site, see CodeAllocator.lock
+class SampleCodeLock(models.Model):
+    ID = 1
+
+
 class Result(models.Model):
     # panel = models.ForeignKey(Panel, on_delete=models.CASCADE, related_name='results')
     sample_set = models.ForeignKey(SampleSet, on_delete=models.CASCADE, related_name='results')
@@ -140,7 +265,7 @@ class Result(models.Model):
                 .exists()):
             raise ValidationError('A Result for this SampleSet already exists')
         # odd sample must belong to sample set
-        if self.odd_sample.sample_set != self.sample_set:
+        if self.odd_sample.sample_set_id != self.sample_set_id:
             raise ValidationError('odd sample does not belong to this Sample Set')
 
     def clean(self):
@@ -148,23 +273,9 @@ class Result(models.Model):
 
     def save(self, *args, **kwargs):
         self.validate()
-        odd_product = (
-            Sample.objects
-            .filter(sample_set=self.sample_set)
-            .values('product_id')
-            .annotate(cnt=models.Count('product_id'))
-            .filter(cnt=1)
-            .values_list('product_id', flat=True)[0]
-        )
-        odd_sample = (
-            Sample.objects
-            .filter(sample_set=self.sample_set)
-            .filter(product_id=odd_product)
-            .values_list('id', flat=True)[0]
-        )
-        self.is_correct = odd_sample == self.odd_sample.id
+        self.is_correct = self.sample_set.get_odd_sample_id() == self.odd_sample_id
         self.sample_set.is_used = True
-        self.sample_set.save()
+        self.sample_set.save(update_fields=('is_used',))
         super().save(*args, **kwargs)
 
 
@@ -247,3 +358,9 @@ class Answer(models.Model):
     result = models.ForeignKey(Result, on_delete=models.CASCADE, related_name='answers')
     answer_code = models.CharField(max_length=10)
     answer_text = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = (
+            # one answer per question, so resubmitted answers are not duplicated
+            models.UniqueConstraint(fields=('result', 'question'), name='unique_answer_per_result'),
+        )
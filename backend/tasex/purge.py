@@ -0,0 +1,54 @@
+from django.db import transaction
+
+from .models import Panel, PanelQuestion, SampleSet, Sample, Result, Answer
+from .signals import panel_results_changed
+
+# panels deleted in a single transaction, keeps locks and memory bounded whatever the number of panels
+PURGE_BATCH_SIZE = 100
+# results deleted with their answers in a single transaction, whatever the size of the panel
+RESULTS_BATCH_SIZE = 1000
+
+
+def _raw_delete(queryset):
+    # a single DELETE in the database, without loading the rows and sending their signals
+    return queryset._raw_delete(queryset.db)
+
+
+def _delete_results(panel_ids, batch_size):
+    # only ids of a batch of results are read, the rest happens in the database
+    deleted = {Answer._meta.label: 0, Result._meta.label: 0}
+    results = Result.objects.filter(sample_set__panel_id__in=panel_ids).order_by('id').values_list('id', flat=True)
+    while result_ids := list(results[:batch_size]):
+        with transaction.atomic():
+            deleted[Answer._meta.label] += _raw_delete(Answer.objects.filter(result_id__in=result_ids))
+            deleted[Result._meta.label] += _raw_delete(Result.objects.filter(id__in=result_ids))
+    return deleted
+
+
+def reset_panels(panel_ids, batch_size=RESULTS_BATCH_SIZE):
+    # deletes results and answers of the panels, so they can be run again with the same samples,
+    # returns deleted rows per model like QuerySet.delete
+    panel_ids = list(panel_ids)
+    deleted = _delete_results(panel_ids, batch_size)
+    with transaction.atomic():
+        SampleSet.objects.filter(panel_id__in=panel_ids).update(is_used=False, claim_token=None)
+        panel_results_changed(panel_ids)
+    return sum(deleted.values()), deleted
+
+
+def purge_panels(panel_ids, batch_size=RESULTS_BATCH_SIZE):
+    # deletes the panels with everything generated for them, returns deleted rows per model like QuerySet.delete
+    panel_ids = list(panel_ids)
+    deleted = _delete_results(panel_ids, batch_size)
+    with transaction.atomic():
+        deleted[PanelQuestion._meta.label] = _raw_delete(PanelQuestion.objects.filter(panel_id__in=panel_ids))
+        # sample sets and samples point to each other
+        SampleSet.objects.filter(panel_id__in=panel_ids).update(odd_sample=None)
+        deleted[Sample._meta.label] = _raw_delete(Sample.objects.filter(panel_id__in=panel_ids))
+        deleted[SampleSet._meta.label] = _raw_delete(SampleSet.objects.filter(panel_id__in=panel_ids))
+        # only the panels are left to the collector, so relations from other apps (demo sessions)
+        # and signals of the panels are handled as usual
+        _, panels = Panel.objects.filter(id__in=panel_ids).delete()
+    for model, count in panels.items():
+        deleted[model] = deleted.get(model, 0) + count
+    return sum(deleted.values()), deleted
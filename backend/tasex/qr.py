@@ -0,0 +1,62 @@
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import caches
+
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# format: (image factory, content type), None is the default PIL image, saved as PNG
+QR_FORMATS = {
+    'png': (None, 'image/png'),
+    'svg': (qrcode.image.svg.SvgPathImage, 'image/svg+xml'),
+}
+DEFAULT_BOX_SIZE = 5
+DEFAULT_BORDER = 4
+MAX_BOX_SIZE = 40
+MAX_BORDER = 20
+# bump when rendering changes, so cached images and ETags of clients are not reused
+QR_RENDER_VERSION = 1
+
+
+def qr_cache_key(url, qr_format, box_size, border):
+    digest = hashlib.sha256(f'{QR_RENDER_VERSION}:{url}:{qr_format}:{box_size}:{border}'.encode()).hexdigest()
+    return f'tasex:qr:{digest[:32]}'
+
+
+def qr_etag(url, qr_format, box_size, border):
+    # the same options always give the same bytes, so the ETag is known without rendering
+    return f'"{qr_cache_key(url, qr_format, box_size, border).rsplit(":", 1)[-1]}"'
+
+
+def _render_qr(url, qr_format, box_size, border):
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_Q,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    image_factory, _ = QR_FORMATS[qr_format]
+    content = BytesIO()
+    if image_factory is None:
+        qr.make_image(fill_color="black", back_color="white").save(content, 'PNG')
+    else:
+        qr.make_image(image_factory=image_factory).save(content)
+    return content.getvalue()
+
+
+@lru_cache(maxsize=256)
+def render_qr(url, qr_format='png', box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER):
+    # in process LRU in front of the cache backend shared by workers (which may keep it on disk)
+    cache = caches[getattr(settings, 'TASEX_QR_CACHE', 'default')]
+    key = qr_cache_key(url, qr_format, box_size, border)
+    content = cache.get(key)
+    if content is None:
+        content = _render_qr(url, qr_format, box_size, border)
+        cache.set(key, content, QR_CACHE_TIMEOUT)
+    return content
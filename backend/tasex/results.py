@@ -0,0 +1,122 @@
+from dataclasses import dataclass, asdict
+
+from django.db.models import Count, Q
+
+from .models import Result, PanelQuestion, Answer
+from .significance import p_value, correct_needed
+
+
+@dataclass(frozen=True)
+class OddProductResult:
+    # results of panelists, whose sample set had this product as the odd one
+    product_id: int
+    participants: int
+    correct: int
+
+
+@dataclass(frozen=True)
+class PanelSummary:
+    participants: int
+    correct: int
+    p_value: float
+    by_odd_product: tuple = ()
+
+    @property
+    def wrong(self):
+        return self.participants - self.correct
+
+    @property
+    def percent_correct(self):
+        if self.correct > 0:
+            return round(self.correct / self.participants * 100)
+        return 0
+
+    @property
+    def correct_needed(self):
+        return correct_needed(self.participants)
+
+    def as_dict(self):
+        data = asdict(self)
+        data.update({
+            'wrong': self.wrong,
+            'percent_correct': self.percent_correct,
+            'correct_needed': self.correct_needed,
+        })
+        return data
+
+
+@dataclass(frozen=True)
+class QuestionSummary:
+    question_id: int
+    question_text: str
+    # (code, text, count) for every point of the question's scale
+    points: tuple
+
+    @property
+    def answers(self):
+        return sum(count for _, _, count in self.points)
+
+
+def summarize_panel(panel):
+    # one grouped query, each row holds results for sample sets with given odd product
+    rows = (
+        Result.objects
+        .filter(sample_set__panel=panel)
+        .values('sample_set__odd_product_id')
+        .annotate(
+            participants=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True))
+        )
+        .order_by('sample_set__odd_product_id')
+    )
+    by_odd_product = tuple(
+        OddProductResult(
+            product_id=row['sample_set__odd_product_id'],
+            participants=row['participants'],
+            correct=row['correct']
+        )
+        for row in rows
+    )
+    participants = sum(row.participants for row in by_odd_product)
+    correct = sum(row.correct for row in by_odd_product)
+    return PanelSummary(
+        participants=participants,
+        correct=correct,
+        p_value=p_value(correct, participants),
+        by_odd_product=by_odd_product
+    )
+
+
+def summarize_survey(panel):
+    # only answers of panelists who identified the odd sample are taken into account
+    counts = {}
+    rows = (
+        Answer.objects
+        .filter(question__panel=panel, result__is_correct=True)
+        .values('question_id', 'answer_code')
+        .annotate(n=Count('id'))
+        .order_by()
+        .values_list('question_id', 'answer_code', 'n')
+    )
+    for question_id, answer_code, n in rows:
+        counts.setdefault(question_id, {})[answer_code] = n
+    if not counts:
+        return ()
+
+    questions = (
+        PanelQuestion.objects
+        .filter(panel=panel)
+        .select_related('scale')
+        .prefetch_related('scale__points')
+    )
+    return tuple(
+        QuestionSummary(
+            question_id=question.id,
+            question_text=question.question_text,
+            points=tuple(
+                (point.code, point.text, counts.get(question.id, {}).get(point.code, 0))
+                for point in question.scale.points.all()
+            )
+        )
+        for question in questions
+    )
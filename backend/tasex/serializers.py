@@ -2,13 +2,46 @@ from rest_framework import serializers
 
 from .models import Experiment, Panel
 
-class ExperimentSerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    # ?fields=id,status limits the output to given fields, unknown names are ignored
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = request.query_params.get('fields') if request is not None else None
+        if fields:
+            for name in set(self.fields) - set(fields.split(',')):
+                self.fields.pop(name)
+
+
+class ExperimentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    product_A_name = serializers.CharField(source='product_A.name', read_only=True)
+    product_B_name = serializers.CharField(source='product_B.name', read_only=True)
+
     class Meta:
         model = Experiment
         fields = '__all__'
 
 
-class PanelSerializer(serializers.ModelSerializer):
+class PanelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    experiment_title = serializers.CharField(source='experiment.title', read_only=True)
+
     class Meta:
         model = Panel
         fields = '__all__'
+
+
+class OddProductResultSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(allow_null=True)
+    participants = serializers.IntegerField()
+    correct = serializers.IntegerField()
+
+
+class PanelSummarySerializer(serializers.Serializer):
+    participants = serializers.IntegerField()
+    correct = serializers.IntegerField()
+    wrong = serializers.IntegerField()
+    percent_correct = serializers.IntegerField()
+    p_value = serializers.FloatField()
+    correct_needed = serializers.IntegerField(allow_null=True)
+    by_odd_product = OddProductResultSerializer(many=True)
@@ -0,0 +1,37 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .context import forget_panel_status
+from .live import notify_results_changed
+from .models import Panel, Result
+
+
+def related_panel_id(instance, relation):
+    # relation is usually loaded already by whoever saved the instance, so this costs no query
+    try:
+        return getattr(instance, relation).panel_id
+    except ObjectDoesNotExist:
+        return None
+
+
+def panel_results_changed(panel_ids):
+    # deleting results and answers, and saving answers, sends no signals: the collector deletes them without
+    # loading each row and a submitted result bumps its panel once, not per answer.
+    # Whoever deletes them, or saves answers, tells their panels once
+    Panel.bump_results_version(id__in=panel_ids)
+    for panel_id in panel_ids:
+        notify_results_changed(panel_id)
+
+
+@receiver(post_save, sender=Result)
+def result_changed(sender, instance, **kwargs):
+    Panel.bump_results_version(sample_sets=instance.sample_set_id)
+    panel_id = related_panel_id(instance, 'sample_set')
+    if panel_id:
+        notify_results_changed(panel_id)
+
+
+@receiver((post_save, post_delete), sender=Panel)
+def panel_changed(sender, instance, **kwargs):
+    forget_panel_status(instance.id)
@@ -0,0 +1,77 @@
+from fractions import Fraction
+from functools import lru_cache
+from math import exp, lgamma, log
+
+# chance of guessing the odd sample in a triangle test
+TRIANGLE_P = Fraction(1, 3)
+DEFAULT_ALPHA = 0.05
+# up to this many participants the tails are summed exactly on integers, above in log space
+EXACT_LIMIT = 1000
+
+
+def _exact_tails(participants, p):
+    # term k is C(n, k) * a^k * (b - a)^(n - k), for p = a / b the tail is sum of terms divided by b^n
+    a, b = p.numerator, p.denominator
+    term = a ** participants
+    denominator = b ** participants
+    total = 0
+    tails = [0.0] * (participants + 1)
+    for k in range(participants, -1, -1):
+        total += term
+        tails[k] = total / denominator
+        if k:
+            term = term * k * (b - a) // ((participants - k + 1) * a)
+    return tails
+
+
+def _log_tails(participants, p):
+    log_p, log_q = log(p), log(1 - p)
+    log_terms = [
+        lgamma(participants + 1) - lgamma(k + 1) - lgamma(participants - k + 1)
+        + k * log_p + (participants - k) * log_q
+        for k in range(participants + 1)
+    ]
+    top = max(log_terms)
+    total = 0.0
+    tails = [0.0] * (participants + 1)
+    for k in range(participants, -1, -1):
+        total += exp(log_terms[k] - top)
+        tails[k] = min(1.0, exp(top) * total)
+    return tails
+
+
+@lru_cache(maxsize=256)
+def binomial_tails(participants, p=TRIANGLE_P):
+    # k-th item is the probability of at least k correct answers when all participants guess
+    p = Fraction(p).limit_denominator(1000)
+    if participants <= EXACT_LIMIT:
+        return tuple(_exact_tails(participants, p))
+    return tuple(_log_tails(participants, float(p)))
+
+
+def p_value(correct, participants, p=TRIANGLE_P):
+    # exact one-tailed binomial test, same as scipy.stats.binomtest(alternative='greater')
+    if not participants or correct <= 0:
+        return 1.0
+    if correct > participants:
+        return 0.0
+    return binomial_tails(participants, p)[correct]
+
+
+@lru_cache(maxsize=4096)
+def correct_needed(participants, alpha=DEFAULT_ALPHA, p=TRIANGLE_P):
+    # the smallest number of correct answers significant at alpha, None if even all correct are not enough
+    if not participants:
+        return None
+    for correct, tail in enumerate(binomial_tails(participants, p)):
+        if tail <= alpha:
+            return correct
+    return None
+
+
+def critical_values(max_participants, alpha=DEFAULT_ALPHA, p=TRIANGLE_P):
+    # participants: correct answers needed, as printed in sensory analysis tables
+    return {
+        participants: correct_needed(participants, alpha, p)
+        for participants in range(1, max_participants + 1)
+    }
@@ -0,0 +1,82 @@
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
+DEFAULT_PANEL_STATE_STORE = 'tasex.state.SessionPanelStateStore'
+PANEL_STATE_COOKIE = 'tasex_panels'
+PANEL_STATE_SALT = 'tasex.state'
+
+
+# Keeps PanelState of the panelist (as dict) between requests, one store instance per request
+# a store missing load or save cannot be created
+class PanelStateStore(ABC):
+    def __init__(self, request):
+        self.request = request
+
+    @abstractmethod
+    def load(self, panel_id):
+        pass
+
+    @abstractmethod
+    def save(self, panel_id, state):
+        pass
+
+    def commit(self, response):
+        # called with the response of the panel view, before it is sent
+        return response
+
+
+class SessionPanelStateStore(PanelStateStore):
+    def load(self, panel_id):
+        return self.request.session.get('panels', {}).get(panel_id)
+
+    def save(self, panel_id, state):
+        panels = self.request.session.get('panels', {})
+        panels[panel_id] = state
+        # marks the session as modified, SessionMiddleware writes it once at the end of the request
+        self.request.session['panels'] = panels
+
+
+# State lives in a signed (not encrypted) cookie, so the panel flow does not write to the database sessions
+class SignedCookiePanelStateStore(PanelStateStore):
+    def __init__(self, request):
+        super().__init__(request)
+        self.changed = False
+        try:
+            self.panels = signing.loads(
+                request.COOKIES.get(PANEL_STATE_COOKIE, ''),
+                salt=PANEL_STATE_SALT,
+                max_age=settings.SESSION_COOKIE_AGE
+            )
+        except signing.BadSignature:
+            self.panels = {}
+
+    def load(self, panel_id):
+        return self.panels.get(panel_id)
+
+    def save(self, panel_id, state):
+        self.panels[panel_id] = state
+        self.changed = True
+
+    def commit(self, response):
+        if self.changed:
+            response.set_cookie(
+                PANEL_STATE_COOKIE,
+                signing.dumps(self.panels, salt=PANEL_STATE_SALT, compress=True),
+                max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax'
+            )
+            self.changed = False
+        return response
+
+
+def get_panel_state_store(request):
+    # delegated views get the same request, so they share the store
+    if not hasattr(request, '_panel_state_store'):
+        store_class = import_string(getattr(settings, 'TASEX_PANEL_STATE_STORE', DEFAULT_PANEL_STATE_STORE))
+        request._panel_state_store = store_class(request)
+    return request._panel_state_store
@@ -0,0 +1,79 @@
+from math import cos, sin, pi
+from xml.sax.saxutils import escape
+
+# matplotlib's default color cycle, used when chart data has no colors
+DEFAULT_COLORS = (
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+)
+WIDTH = 640
+HEIGHT = 480
+RADIUS = 150
+
+
+def split_chart_data(data):
+    # chart data is a dict of label: value items with optional title, explode and colors keys
+    data = data.copy()
+    title = data.pop('title', None)
+    explode = data.pop('explode', None)
+    colors = data.pop('colors', None) or DEFAULT_COLORS
+    explode = explode or [0] * len(data)
+    return title, list(data.keys()), list(data.values()), list(explode), list(colors)
+
+
+def chart_json(data):
+    title, labels, values, explode, colors = split_chart_data(data)
+    return {
+        'title': title,
+        'labels': labels,
+        'values': values,
+        'explode': explode,
+        'colors': colors[:len(values)],
+    }
+
+
+def _svg(title, body):
+    header = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" '
+        f'width="{WIDTH}" height="{HEIGHT}" font-family="sans-serif" font-size="14">'
+    )
+    if title:
+        header += f'<text x="{WIDTH / 2}" y="30" text-anchor="middle" font-size="16">{escape(title)}</text>'
+    return header + ''.join(body) + '</svg>'
+
+
+def _point(cx, cy, r, angle):
+    # angles go counterclockwise from 3 o'clock, like in matplotlib
+    return cx + r * cos(angle), cy - r * sin(angle)
+
+
+def pie_chart(data):
+    title, labels, values, explode, colors = split_chart_data(data)
+    total = sum(values)
+    body = []
+    angle = 0
+    for idx, (label, value) in enumerate(zip(labels, values)):
+        if not value:
+            continue
+        sweep = 2 * pi * value / total
+        middle = angle + sweep / 2
+        # exploded slice is moved away from the center along its middle
+        cx, cy = _point(WIDTH / 2, HEIGHT / 2 + 20, RADIUS * explode[idx], middle)
+        color = colors[idx % len(colors)]
+        if value == total:
+            body.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{RADIUS}" fill="{color}"/>')
+        else:
+            x1, y1 = _point(cx, cy, RADIUS, angle)
+            x2, y2 = _point(cx, cy, RADIUS, angle + sweep)
+            large_arc = int(sweep > pi)
+            body.append(
+                f'<path d="M{cx:.1f},{cy:.1f} L{x1:.1f},{y1:.1f} '
+                f'A{RADIUS},{RADIUS} 0 {large_arc} 0 {x2:.1f},{y2:.1f} Z" fill="{color}"/>'
+            )
+        x, y = _point(cx, cy, RADIUS * 0.6, middle)
+        body.append(f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="middle">{round(value / total * 100)}%</text>')
+        x, y = _point(cx, cy, RADIUS * 1.1, middle)
+        anchor = 'start' if cos(middle) >= 0 else 'end'
+        body.append(f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="{anchor}">{escape(str(label))}</text>')
+        angle += sweep
+    return _svg(title, body)
@@ -0,0 +1,9 @@
+from django.test.runner import DiscoverRunner
+
+
+# Benchmarks measure wall time, so they run only when asked for: with --tag benchmark or by their label
+class TestRunner(DiscoverRunner):
+    def build_suite(self, test_labels=None, *args, **kwargs):
+        if 'benchmark' not in self.tags and not any('benchmark' in label for label in test_labels or ()):
+            self.exclude_tags.add('benchmark')
+        return super().build_suite(test_labels, *args, **kwargs)
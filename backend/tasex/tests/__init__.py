@@ -1,3 +1,15 @@
 from .models import *
 from .tmp_gui_preparation import *
 from .tmp_gui_tasting import *
+from .codes import *
+from .results import *
+from .startup import *
+from .significance import *
+from .state import *
+from .context import *
+from .live import *
+from .qr import *
+from .exports import *
+from .purge import *
+from .api import *
+from .benchmarks import *
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.utils import timezone
+
+from ..models import Experiment, Panel
+
+
+class PanelApiTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.exp = Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7')
+        self.panels = [
+            Panel.objects.create(experiment=self.exp, description=f'panel {idx}', planned_panelists=1)
+            for idx in range(5)
+        ]
+        Panel.objects.filter(id__in=[panel.id for panel in self.panels[:2]]).update(
+            status=Panel.PanelStatus.ACCEPTING_ANSWERS
+        )
+        self.c = Client()
+        self.c.force_login(User.objects.create_superuser('api_user', 'mail@mail.com', 'api_password'))
+
+    def get(self, url, **params):
+        response = self.c.get(url, params)
+        self.assertEquals(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pagination(self):
+        page = self.get('/api/panels/', page_size=2)
+        self.assertEquals(len(page['results']), 2)
+        # newest first
+        self.assertEquals(page['results'][0]['id'], str(self.panels[-1].id))
+        seen = [panel['id'] for panel in page['results']]
+        while page['next']:
+            page = self.c.get(page['next']).json()
+            seen += [panel['id'] for panel in page['results']]
+        self.assertEquals(seen, [str(panel.id) for panel in reversed(self.panels)])
+
+    def test_queries_do_not_depend_on_panels(self):
+        # session, user, panels with experiment
+        with self.assertNumQueries(3):
+            self.get('/api/panels/')
+        for idx in range(10):
+            Panel.objects.create(experiment=self.exp, description=f'more {idx}', planned_panelists=1)
+        with self.assertNumQueries(3):
+            page = self.get('/api/panels/')
+        self.assertEquals(page['results'][0]['experiment_title'], self.exp.title)
+        with self.assertNumQueries(3):
+            self.get('/api/experiments/')
+
+    def test_filters(self):
+        page = self.get('/api/panels/', status=Panel.PanelStatus.ACCEPTING_ANSWERS)
+        self.assertEquals(len(page['results']), 2)
+        page = self.get('/api/panels/?status=PLANNED&status=ACCEPTING_ANSWERS')
+        self.assertEquals(len(page['results']), 5)
+        page = self.get('/api/panels/', experiment=self.exp.id)
+        self.assertEquals(len(page['results']), 5)
+
+        Panel.objects.filter(id=self.panels[0].id).update(created_at=timezone.now() - timedelta(days=10))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        page = self.get('/api/panels/', created_after=since)
+        self.assertEquals(len(page['results']), 4)
+        page = self.get('/api/panels/', created_before=since)
+        self.assertEquals([panel['id'] for panel in page['results']], [str(self.panels[0].id)])
+
+        modified_at = timezone.now() - timedelta(days=5)
+        Panel.objects.filter(id=self.panels[1].id).update(modified_at=modified_at)
+        page = self.get('/api/panels/', modified_before=modified_at.isoformat())
+        self.assertEquals([panel['id'] for panel in page['results']], [str(self.panels[1].id)])
+        page = self.get('/api/panels/', modified_after=since)
+        self.assertEquals(len(page['results']), 4)
+
+        self.assertEquals(self.c.get('/api/panels/', {'status': 'CLOSED'}).status_code, 400)
+
+    def test_sparse_fields(self):
+        page = self.get('/api/panels/', fields='id,status')
+        self.assertEquals(set(page['results'][0]), {'id', 'status'})
+        panel = self.get(f'/api/panels/{self.panels[0].id}/', fields='description')
+        self.assertEquals(panel, {'description': 'panel 0'})
+        experiment = self.get(f'/api/experiments/{self.exp.id}/')
+        self.assertIn('product_A_name', experiment)
@@ -0,0 +1,215 @@
+import json
+import os
+import tracemalloc
+from pathlib import Path
+from random import random
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Experiment, Panel, SampleSet, Result, Answer, PanelQuestion, QuestionSet
+
+# committed measurements the views are compared against, benchmarks run only with --tag benchmark
+# or their label (manage.py test tasex.tests.benchmarks),
+# run with TASEX_BENCHMARK_RECORD=1 to write current measurements as the new baseline
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+RECORD = bool(os.environ.get('TASEX_BENCHMARK_RECORD'))
+PANEL_SIZES = (10, 100, 1000)
+# wall time and memory are noisy, so they fail only when they grow with panel size much faster than in baseline
+TIME_TOLERANCE = 3.0
+MEMORY_TOLERANCE = 1.5
+# read only scenarios are repeated and the fastest run is taken
+REPEAT = 3
+
+
+def measure(run):
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        start = perf_counter()
+        run()
+        seconds = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'queries': len(queries), 'seconds': seconds, 'peak_memory': peak}
+
+
+@tag('benchmark')
+class ViewBenchmarks(TestCase):
+    fixtures = ['test_base', 'questions']
+    measurements = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('bench_user', 'mail@mail.com', 'bench_password')
+        experiment = Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7')
+        question_set = QuestionSet.objects.get(id=6660001)
+        cls.accepting = {}
+        cls.presenting = {}
+        for size in PANEL_SIZES:
+            for status, panels in (
+                    (Panel.PanelStatus.ACCEPTING_ANSWERS, cls.accepting),
+                    (Panel.PanelStatus.PRESENTING_RESULTS, cls.presenting)
+            ):
+                panel = Panel.objects.create(
+                    experiment=experiment,
+                    description=f'benchmark {size} {status}',
+                    planned_panelists=size
+                )
+                PanelQuestion.objects.bulk_create([
+                    PanelQuestion(
+                        panel=panel,
+                        order=question_order.order,
+                        question_text=question_order.question.question_text,
+                        scale=question_order.question.scale
+                    )
+                    for question_order in question_set.question_order.all()
+                ])
+                Panel.objects.filter(id=panel.id).update(status=status)
+                panel.refresh_from_db()
+                panels[size] = panel
+                if status == Panel.PanelStatus.PRESENTING_RESULTS:
+                    cls.answer_all(panel)
+
+    @staticmethod
+    def answer_all(panel):
+        sample_sets = list(SampleSet.objects.filter(panel=panel).prefetch_related('samples'))
+        chosen = [
+            sample_set.odd_sample_id if random() < 0.5
+            else next(sample.id for sample in sample_set.samples.all() if sample.id != sample_set.odd_sample_id)
+            for sample_set in sample_sets
+        ]
+        results = Result.objects.bulk_create([
+            Result(
+                sample_set=sample_set,
+                odd_sample_id=odd_sample_id,
+                is_correct=odd_sample_id == sample_set.odd_sample_id
+            )
+            for sample_set, odd_sample_id in zip(sample_sets, chosen)
+        ])
+        SampleSet.objects.filter(panel=panel).update(is_used=True)
+        questions = PanelQuestion.objects.filter(panel=panel).prefetch_related('scale__points')
+        Answer.objects.bulk_create([
+            Answer(question=question, result=result, answer_code=point.code, answer_text=point.text)
+            for result in results
+            for question in questions
+            for point in question.scale.points.all()[:1]
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        if RECORD:
+            baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+            baseline.update(cls.measurements)
+            BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        super().tearDownClass()
+
+    def setUp(self):
+        self.admin = Client()
+        self.admin.force_login(self.user)
+
+    def benchmark(self, scenario, run, repeat=REPEAT):
+        # run(size) does the requests of the scenario for a panel with `size` panelists
+        results = {}
+        for size in PANEL_SIZES:
+            runs = [measure(lambda: run(size)) for _ in range(repeat)]
+            results[str(size)] = {
+                'queries': max(item['queries'] for item in runs),
+                'seconds': min(item['seconds'] for item in runs),
+                'peak_memory': min(item['peak_memory'] for item in runs),
+            }
+        self.measurements[scenario] = results
+        if RECORD:
+            return
+
+        baseline = json.loads(BASELINE_PATH.read_text()).get(scenario)
+        self.assertIsNotNone(baseline, f'No baseline for {scenario}, record it with TASEX_BENCHMARK_RECORD=1')
+        smallest, largest = str(PANEL_SIZES[0]), str(PANEL_SIZES[-1])
+        for size, measured in results.items():
+            self.assertLessEqual(
+                measured['queries'],
+                baseline[size]['queries'],
+                f'{scenario}: more queries than in baseline for {size} panelists'
+            )
+        for metric, tolerance in (('seconds', TIME_TOLERANCE), ('peak_memory', MEMORY_TOLERANCE)):
+            growth = results[largest][metric] / max(results[smallest][metric], 1e-9)
+            baseline_growth = baseline[largest][metric] / max(baseline[smallest][metric], 1e-9)
+            self.assertLessEqual(
+                growth,
+                max(baseline_growth, 1) * tolerance,
+                f'{scenario}: {metric} grows with panel size faster than in baseline'
+            )
+
+    def get(self, client, url, status_code=200):
+        response = client.get(url)
+        self.assertEquals(response.status_code, status_code)
+        return response
+
+    def post(self, client, url, data):
+        # every step of the form redirects back to the panel, a form error would measure the wrong path
+        response = client.post(url, data=data)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        return response
+
+    def test_panelist_flow(self):
+        def run(size):
+            panel = self.accepting[size]
+            sample_set = SampleSet.objects.filter(panel=panel, is_used=False).select_related('odd_sample').first()
+            questions = PanelQuestion.objects.filter(panel=panel).prefetch_related('scale__points')
+            c = Client()
+            url = panel.get_absolute_url()
+            self.get(c, url)
+            self.post(c, url, {'code': sample_set.odd_sample.code})
+            self.get(c, url)
+            self.post(c, url, {'are_samples_correct': 'True'})
+            self.get(c, url)
+            self.post(c, url, {'odd_sample': sample_set.odd_sample_id})
+            self.get(c, url)
+            self.post(c, url, {str(question.id): question.scale.points.all()[0].code for question in questions})
+            self.get(c, url)
+
+        self.benchmark('panelist_flow', run, repeat=1)
+
+    def test_results(self):
+        def run(size):
+            panel = self.presenting[size]
+            c = Client()
+            self.get(c, panel.get_absolute_url())
+            self.get(c, reverse('tasex:panel-chart', kwargs={
+                'pk': panel.id,
+                'version': panel.results_version,
+                'name': 'correct',
+                'chart_format': 'svg'
+            }))
+
+        self.benchmark('results', run)
+
+    def test_admin_panel(self):
+        self.benchmark('admin_panel', lambda size: self.get(self.admin, self.presenting[size].get_absolute_url()))
+
+    def test_sample_preparation(self):
+        self.benchmark('sample_preparation', lambda size: self.get(
+            self.admin, reverse('tasex:panel-prepare', kwargs={'pk': self.accepting[size].id})
+        ))
+
+    def test_sample_sets(self):
+        self.benchmark('sample_sets', lambda size: self.get(
+            self.admin, reverse('tasex:panel-sets', kwargs={'pk': self.accepting[size].id})
+        ))
+
+    def test_qr_code(self):
+        self.benchmark('qr_code', lambda size: self.get(
+            Client(), reverse('tasex:panel-qr', kwargs={'pk': self.accepting[size].id})
+        ))
+
+    def test_api(self):
+        def run(size):
+            self.get(self.admin, '/api/panels/')
+            self.get(self.admin, '/api/experiments/')
+            self.get(self.admin, f'/api/panels/{self.presenting[size].id}/')
+            self.get(self.admin, f'/api/panels/{self.presenting[size].id}/results/')
+
+        self.benchmark('api', run)
@@ -0,0 +1,84 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from ..codes import CodeAllocator, luhn_check_digit, UNIQUE_PER_SITE
+from ..forms import SingleSampleForm
+from ..models import Experiment, Panel, Sample, SampleCodeLock
+from ..views import PanelState
+
+
+class CodeAllocatorTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.exp = Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7')
+        self.DEFAULT_PANEL_ATTRIBUTES = {
+            'experiment': self.exp,
+            'description': 'pnl_description',
+            'planned_panelists': 5,
+            'status': Panel.PanelStatus.ACCEPTING_ANSWERS,
+        }
+
+    def test_codes_are_unique_and_of_requested_length(self):
+        codes = CodeAllocator(length=4).allocate(9000)
+        self.assertEquals(len(codes), len(set(codes)))
+        self.assertTrue(all(len(code) == 4 for code in codes))
+
+    def test_longer_codes_when_pool_is_too_small(self):
+        codes = CodeAllocator(length=4).allocate(9001)
+        self.assertEquals(len(codes), len(set(codes)))
+        self.assertTrue(all(len(code) == 5 for code in codes))
+
+        with self.assertRaises(ValidationError):
+            CodeAllocator(length=9).allocate(10 ** 9)
+
+    def test_check_digit(self):
+        self.assertEquals(luhn_check_digit('7992739871'), '3')
+        allocator = CodeAllocator(length=4, check_digit=True)
+        codes = allocator.allocate(100)
+        self.assertTrue(all(len(code) == 5 and allocator.is_valid(code) for code in codes))
+        # single digit typo is always detected
+        code = codes[0]
+        typo = code[:-2] + str((int(code[-2]) + 1) % 10) + code[-1]
+        self.assertFalse(allocator.is_valid(typo))
+
+    def test_codes_unique_per_site(self):
+        pnl = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+        used = set(Sample.objects.filter(sample_set__panel=pnl).values_list('code', flat=True))
+        # whole pool of 4 digit codes except the ones used by the running panel
+        codes = CodeAllocator(length=4, unique=UNIQUE_PER_SITE).allocate(9000 - len(used))
+        self.assertEquals(len(codes), 9000 - len(used))
+        self.assertTrue(all(len(code) == 4 for code in codes))
+        self.assertFalse(used & set(codes))
+
+    @override_settings(TASEX_SAMPLE_CODES={'LENGTH': 6, 'CHECK_DIGIT': True})
+    def test_panel_uses_configured_allocator(self):
+        pnl = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+        codes = Sample.objects.filter(sample_set__panel=pnl).values_list('code', flat=True)
+        self.assertEquals(len(codes), 15)
+        self.assertTrue(all(len(code) == 7 for code in codes))
+
+    @override_settings(TASEX_SAMPLE_CODES={'UNIQUE': UNIQUE_PER_SITE})
+    def test_site_wide_codes_drawn_under_lock(self):
+        first = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+        second = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+        self.assertEquals(SampleCodeLock.objects.count(), 1)
+        codes = Sample.objects.filter(panel__in=(first, second)).values_list('code', flat=True)
+        self.assertEquals(len(codes), len(set(codes)))
+
+    def test_panel_codes_checked_as_drawn(self):
+        plain = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+        self.assertFalse(plain.code_check_digit)
+
+        with self.settings(TASEX_SAMPLE_CODES={'CHECK_DIGIT': True}):
+            checked = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+            self.assertTrue(checked.code_check_digit)
+            # codes drawn before the setting changed are still accepted, typos in new ones are not
+            for pnl in (plain, checked):
+                for code in Sample.objects.filter(panel=pnl).values_list('code', flat=True):
+                    form = SingleSampleForm(data={'code': code}, panel_state=PanelState(str(pnl.id)))
+                    self.assertTrue(form.is_valid(), form.errors)
+            code = Sample.objects.filter(panel=checked).values_list('code', flat=True).first()
+            typo = code[:-1] + str((int(code[-1]) + 1) % 10)
+            form = SingleSampleForm(data={'code': typo}, panel_state=PanelState(str(checked.id)))
+            self.assertFalse(form.is_valid())
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, SimpleTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..context import forget_panel_status, remember_panel_status, cached_panel_status
+from ..models import Experiment, Panel
+
+
+class PanelStatusCacheTests(SimpleTestCase):
+    @mock.patch('tasex.context.PANEL_STATUS_CACHE_SIZE', 3)
+    @mock.patch('tasex.context._panel_statuses', OrderedDict())
+    def test_oldest_status_dropped(self):
+        panel_ids = [uuid4() for _ in range(4)]
+        for panel_id in panel_ids:
+            remember_panel_status(panel_id, 'PLANNED')
+        self.assertIsNone(cached_panel_status(panel_ids[0]))
+        self.assertEquals([cached_panel_status(panel_id) for panel_id in panel_ids[1:]], ['PLANNED'] * 3)
+
+    @mock.patch('tasex.context._panel_statuses', OrderedDict())
+    def test_panel_id_forms_share_status(self):
+        panel_id = uuid4()
+        remember_panel_status(panel_id.hex, 'HIDDEN')
+        self.assertEquals(cached_panel_status(str(panel_id)), 'HIDDEN')
+        forget_panel_status(panel_id)
+        self.assertIsNone(cached_panel_status(panel_id.hex))
+
+
+class PanelContextTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.pnl = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=5,
+            status=Panel.PanelStatus.ACCEPTING_ANSWERS
+        )
+        self.c = Client()
+
+    def tearDown(self):
+        forget_panel_status(self.pnl.id)
+
+    def panel_queries(self, method='get', **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.c, method)(self.pnl.get_absolute_url(), **kwargs)
+        self.assertIn(response.status_code, (200, 302))
+        return sum('FROM "tasex_panel"' in query['sql'] for query in queries)
+
+    def test_panel_loaded_once(self):
+        self.assertEquals(self.panel_queries(), 1)
+
+    def test_cached_status(self):
+        self.panel_queries()
+        # first step does not show the panel, so with its status cached it is not loaded at all
+        self.assertEquals(self.panel_queries('post', data={'code': '0000'}), 0)
+        self.assertEquals(self.panel_queries(), 0)
+
+    def test_status_change_seen(self):
+        self.panel_queries()
+        self.pnl.status = Panel.PanelStatus.HIDDEN
+        self.pnl.save()
+        self.assertEquals(self.c.get(self.pnl.get_absolute_url()).status_code, 403)
+
+        admin = Client()
+        admin.force_login(User.objects.create_superuser('ctx_user', 'mail@mail.com', 'ctx_password'))
+        admin.get(reverse('tasex:panel-update-status', kwargs={
+            'pk': self.pnl.id,
+            'status': Panel.PanelStatus.PLANNED
+        }))
+        self.assertTemplateUsed(self.c.get(self.pnl.get_absolute_url()), 'tasex/panel_planned.html')
+
+    @override_settings(TASEX_PANEL_STATUS_TTL=0)
+    def test_status_cache_off(self):
+        self.panel_queries()
+        self.assertEquals(self.panel_queries('post', data={'code': '0000'}), 1)
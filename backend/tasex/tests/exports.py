@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..exports import LABELS_PER_PAGE, RESULT_COLUMNS, parquet_available
+from ..models import Experiment, Panel, Sample, SampleSet, Result, Answer, PanelQuestion, Scale
+
+
+class PrepSheetTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.pnl = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=15
+        )
+        self.c = Client()
+        self.c.force_login(User.objects.create_superuser('prep_user', 'mail@mail.com', 'prep_password'))
+
+    def url(self, sheet_format, **params):
+        url = reverse('tasex:panel-prep-sheet', kwargs={'pk': self.pnl.id, 'sheet_format': sheet_format})
+        return url + ('?' + '&'.join(f'{key}={value}' for key, value in params.items()) if params else '')
+
+    def read_csv(self, **params):
+        response = self.c.get(self.url('csv', **params))
+        self.assertEquals(response['Content-Type'], 'text/csv')
+        return list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_csv_by_trays(self):
+        # session, user and panel, samples are fetched while streaming
+        with self.assertNumQueries(3):
+            response = self.c.get(self.url('csv'))
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEquals(len(rows), 45)
+        self.assertEquals(
+            [(row['tray'], row['position']) for row in rows[:4]],
+            [('1', '1'), ('1', '2'), ('1', '3'), ('2', '1')]
+        )
+
+        first_set = Sample.objects.filter(panel=self.pnl).order_by('sample_set_id', 'code')[:3]
+        self.assertEquals([row['code'] for row in rows[:3]], [sample.code for sample in first_set])
+
+    def test_csv_by_products(self):
+        rows = self.read_csv(layout='products')
+        products = [row['product'] for row in rows]
+        self.assertEquals(products, sorted(products))
+        self.assertEquals(
+            sorted(row['code'] for row in rows),
+            sorted(Sample.objects.filter(panel=self.pnl).values_list('code', flat=True))
+        )
+
+    def test_labels(self):
+        content = b''.join(self.c.get(self.url('html')).streaming_content).decode()
+        self.assertEquals(content.count('class="label"'), 45)
+        self.assertEquals(content.count('class="sheet"'), -(-45 // LABELS_PER_PAGE))
+
+        # every product starts a page
+        content = b''.join(self.c.get(self.url('html', layout='products')).streaming_content).decode()
+        self.assertEquals(content.count('class="sheet"'), 2 + sum(
+            (count - 1) // LABELS_PER_PAGE
+            for count in (
+                Sample.objects.filter(panel=self.pnl, product=self.pnl.experiment.product_A).count(),
+                Sample.objects.filter(panel=self.pnl, product=self.pnl.experiment.product_B).count(),
+            )
+        ))
+
+    def test_access(self):
+        self.assertEquals(Client().get(self.url('csv')).status_code, 403)
+        self.assertEquals(self.c.get(self.url('pdf')).status_code, 404)
+        self.assertEquals(self.c.get(self.url('csv', layout='other')).status_code, 404)
+
+
+class ResultsExportTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.exp = Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7')
+        self.pnl = Panel.objects.create(experiment=self.exp, description='pnl_description', planned_panelists=4)
+        scale = Scale.objects.create(name='AB')
+        questions = [
+            PanelQuestion.objects.create(panel=self.pnl, order=order, question_text=f'Q{order}', scale=scale)
+            for order in range(2)
+        ]
+        # 3 results, the last one without answers
+        for idx, sample_set in enumerate(SampleSet.objects.filter(panel=self.pnl).order_by('id')[:3]):
+            result = Result.objects.create(sample_set=sample_set, odd_sample=sample_set.odd_sample)
+            if idx < 2:
+                Answer.objects.bulk_create([
+                    Answer(question=question, result=result, answer_code='A', answer_text='Text A')
+                    for question in questions
+                ])
+        # other panel of the experiment
+        other = Panel.objects.create(experiment=self.exp, description='other', planned_panelists=1)
+        sample_set = SampleSet.objects.get(panel=other)
+        Result.objects.create(
+            sample_set=sample_set,
+            odd_sample=sample_set.samples.exclude(id=sample_set.odd_sample_id)[0]
+        )
+
+        self.c = Client()
+        self.c.force_login(User.objects.create_superuser('export_user', 'mail@mail.com', 'export_password'))
+
+    def get(self, export_format, **kwargs):
+        kwargs = kwargs or {'pk': self.pnl.id}
+        name = 'tasex:panel-results-export' if 'pk' in kwargs else 'tasex:experiment-results-export'
+        return self.c.get(reverse(name, kwargs={'export_format': export_format, **kwargs}))
+
+    def test_csv(self):
+        response = self.get('csv')
+        self.assertEquals(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEquals(len(rows), 5)
+        self.assertEquals([row['question_order'] for row in rows], ['0', '1', '0', '1', ''])
+        self.assertTrue(all(row['is_correct'] == 'True' for row in rows))
+        self.assertTrue(all(row['odd_sample'] == row['chosen_sample'] for row in rows))
+        self.assertEquals({row['panel'] for row in rows}, {str(self.pnl.id)})
+
+    def test_jsonl_of_experiment(self):
+        response = self.get('jsonl', experiment_pk=self.exp.id)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEquals(len(rows), 6)
+        self.assertEquals(sum(not row['is_correct'] for row in rows), 1)
+        self.assertIsNone(rows[-1]['answer_code'])
+
+    @skipIf(parquet_available(), 'pyarrow is installed')
+    def test_parquet_without_pyarrow(self):
+        self.assertEquals(self.get('parquet').status_code, 404)
+        with self.assertRaises(CommandError):
+            call_command('export_results', format='parquet', output='results.parquet')
+        self.assertNotContains(self.c.get(self.pnl.get_absolute_url()), 'Parquet')
+
+    @skipUnless(parquet_available(), 'pyarrow is not installed, see requirements-optional.txt')
+    def test_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        response = self.get('parquet')
+        self.assertEquals(response['Content-Type'], 'application/vnd.apache.parquet')
+        table = pq.read_table(pa.BufferReader(b''.join(response.streaming_content)))
+        self.assertEquals(table.column_names, list(RESULT_COLUMNS))
+        rows = table.to_pylist()
+        self.assertEquals(len(rows), 5)
+        self.assertEquals([row['question_order'] for row in rows], [0, 1, 0, 1, None])
+        self.assertEquals({row['panel'] for row in rows}, {str(self.pnl.id)})
+        self.assertContains(self.c.get(self.pnl.get_absolute_url()), 'Parquet')
+
+    def test_access(self):
+        self.assertEquals(Client().get(reverse('tasex:panel-results-export', kwargs={
+            'pk': self.pnl.id,
+            'export_format': 'csv'
+        })).status_code, 403)
+        self.assertEquals(self.get('xls').status_code, 404)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_results', panel=str(self.pnl.id), format='jsonl', stdout=out)
+        self.assertEquals(len(out.getvalue().splitlines()), 5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.csv')
+            call_command('export_results', experiment=str(self.exp.id), output=path)
+            with open(path, newline='') as output:
+                self.assertEquals(len(list(csv.DictReader(output))), 6)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, Client, AsyncClient
+from django.urls import reverse
+
+from ..live import LocalBroker, get_live_broker, panel_channel, results_stream
+from ..models import Experiment, Panel, SampleSet, Result
+
+
+def parse_events(chunk):
+    return [
+        json.loads(line[len('data: '):])
+        for line in chunk.splitlines()
+        if line.startswith('data: ')
+    ]
+
+
+class LocalBrokerTests(TestCase):
+    async def test_publish_reaches_subscribers_of_channel(self):
+        broker = LocalBroker()
+        first, second, other = broker.subscribe('a'), broker.subscribe('a'), broker.subscribe('b')
+        broker.publish('a', 1)
+        self.assertEquals(await first.get(1), 1)
+        self.assertEquals(await second.get(1), 1)
+        with self.assertRaises(asyncio.TimeoutError):
+            await other.get(0.01)
+
+        # pending messages are coalesced, closed subscription gets nothing
+        broker.publish('a', 2)
+        broker.publish('a', 3)
+        second.close()
+        self.assertEquals(await first.get(1), 3)
+        self.assertEquals(first.queue.qsize(), 0)
+        self.assertEquals(set(broker._subscriptions['a']), {first})
+
+
+class LiveResultsTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.pnl = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=6,
+            status=Panel.PanelStatus.ACCEPTING_ANSWERS
+        )
+        self.user = User.objects.create_superuser('live_user', 'mail@mail.com', 'live_password')
+        self.url = reverse('tasex:panel-live', kwargs={'pk': self.pnl.id})
+
+    def add_result(self):
+        sample_set = SampleSet.objects.filter(panel=self.pnl, is_used=False).select_related('odd_sample').first()
+        # subscribers are notified after commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(sample_set=sample_set, odd_sample=sample_set.odd_sample)
+
+    def test_anonymous_user_denied(self):
+        self.assertEquals(Client().get(self.url).status_code, 403)
+
+    def test_current_results_without_asgi(self):
+        self.add_result()
+        c = Client()
+        c.force_login(self.user)
+        response = c.get(self.url)
+        self.assertEquals(response['Content-Type'], 'text/event-stream')
+        events = parse_events(b''.join(response.streaming_content).decode())
+        self.assertEquals(len(events), 1)
+        self.assertEquals(events[0]['participants'], 1)
+        self.assertEquals(events[0]['correct'], 1)
+
+    async def test_results_pushed(self):
+        c = AsyncClient()
+        await sync_to_async(c.force_login)(self.user)
+        response = await c.get(self.url)
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'retry:', await anext(stream))
+        self.assertEquals(parse_events((await anext(stream)).decode())[0]['participants'], 0)
+
+        await sync_to_async(self.add_result)()
+        event = parse_events((await asyncio.wait_for(anext(stream), 5)).decode())[0]
+        self.assertEquals(event['participants'], 1)
+        self.assertEquals(event['questions'], [])
+        self.assertIn(panel_channel(self.pnl.id), get_live_broker()._subscriptions)
+
+    async def test_stream_ends_after_lifetime(self):
+        stream = results_stream(self.pnl)
+        with mock.patch('tasex.live.STREAM_LIFETIME_SECONDS', 0.05):
+            chunks = [chunk async for chunk in stream]
+        # ended on its own, the browser reconnects after the retry time
+        self.assertTrue(chunks[0].startswith('retry:'))
+        self.assertEquals(parse_events(chunks[1])[0]['participants'], 0)
+        self.assertNotIn(panel_channel(self.pnl.id), get_live_broker()._subscriptions)
+
+    async def test_closed_stream_unsubscribes(self):
+        stream = results_stream(self.pnl)
+        await anext(stream)
+        self.assertIn(panel_channel(self.pnl.id), get_live_broker()._subscriptions)
+        await stream.aclose()
+        self.assertNotIn(panel_channel(self.pnl.id), get_live_broker()._subscriptions)
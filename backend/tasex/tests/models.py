@@ -1,4 +1,5 @@
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
 from ..models import Experiment, Product, Panel, SampleSet, Sample, Result
@@ -82,6 +83,55 @@ class PanelModelTests(TestCase):
             len(set(samples_codes))
         )
 
+    def test_create_panel_query_count_does_not_depend_on_panelists(self):
+        panel_attributes = self.DEFAULT_PANEL_ATTRIBUTES.copy()
+        panel_attributes['planned_panelists'] = 3
+        # savepoint, panel, sample sets, samples, odd samples, release savepoint
+        with self.assertNumQueries(6):
+            Panel.objects.create(**panel_attributes)
+
+        panel_attributes['planned_panelists'] = 30
+        with self.assertNumQueries(6):
+            Panel.objects.create(**panel_attributes)
+
+        # every sample belongs to an existing sample set of its panel
+        self.assertEquals(
+            Sample.objects.filter(sample_set__panel__planned_panelists=30).count(),
+            30 * 3
+        )
+
+    def test_create_panel_stores_odd_sample(self):
+        panel_attributes = self.DEFAULT_PANEL_ATTRIBUTES.copy()
+        panel_attributes['planned_panelists'] = 7
+        pnl = Panel.objects.create(**panel_attributes)
+
+        for sample_set in SampleSet.objects.filter(panel=pnl).select_related('odd_sample'):
+            products = list(sample_set.samples.values_list('product_id', flat=True))
+            self.assertEquals(products.count(sample_set.odd_product_id), 1)
+            self.assertEquals(sample_set.odd_sample.product_id, sample_set.odd_product_id)
+            self.assertEquals(sample_set.odd_sample.sample_set_id, sample_set.id)
+
+    def test_find_sample_by_code(self):
+        panel_attributes = self.DEFAULT_PANEL_ATTRIBUTES.copy()
+        panel_attributes['planned_panelists'] = 3
+        pnl = Panel.objects.create(**panel_attributes)
+        other = Panel.objects.create(**panel_attributes)
+        sample = Sample.objects.filter(panel=pnl).select_related('sample_set').first()
+        self.assertEquals(sample.panel_id, sample.sample_set.panel_id)
+
+        with self.assertNumQueries(1):
+            self.assertEquals(Sample.find(pnl.id, int(sample.code)), (sample.sample_set_id, False))
+        SampleSet.claim(sample.sample_set_id)
+        self.assertEquals(Sample.find(pnl.id, sample.code), (sample.sample_set_id, True))
+        if not Sample.objects.filter(panel=other, code=sample.code).exists():
+            self.assertIsNone(Sample.find(other.id, sample.code))
+
+    def test_sample_code_unique_per_panel(self):
+        pnl = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
+        sample = Sample.objects.filter(panel=pnl).first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Sample.objects.create(sample_set=sample.sample_set, product=sample.product, code=sample.code)
+
     def test_editing_fields(self):
         pnl = Panel.objects.create(**self.DEFAULT_PANEL_ATTRIBUTES)
 
@@ -120,6 +170,21 @@ class ResultModelTest(TestCase):
         )
         self.assertTrue(result.is_correct)
 
+    def test_save_answer_for_generated_panel(self):
+        pnl = Panel.objects.create(
+            experiment=self.panel.experiment,
+            description='pnl_description',
+            planned_panelists=1,
+        )
+        sample_set = SampleSet.objects.select_related('odd_sample').get(panel=pnl)
+        # no aggregation: check for other results, mark set as used, insert result, bump results version
+        with self.assertNumQueries(4):
+            result = Result.objects.create(
+                sample_set=sample_set,
+                odd_sample=sample_set.odd_sample
+            )
+        self.assertTrue(result.is_correct)
+
     def test_save_incorrect_answer(self):
         result = Result.objects.create(
             sample_set=self.sample_set,
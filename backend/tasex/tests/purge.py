@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Experiment, Panel, Sample, SampleSet, Result, Answer, PanelQuestion, Scale
+from ..purge import purge_panels, reset_panels
+
+
+class PanelsTestCase(TestCase):
+    fixtures = ['test_base']
+
+    def create_panel(self, panelists):
+        panel = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=panelists
+        )
+        question = PanelQuestion.objects.create(panel=panel, order=0, question_text='Q', scale=self.scale)
+        for sample_set in SampleSet.objects.filter(panel=panel).select_related('odd_sample'):
+            result = Result.objects.create(sample_set=sample_set, odd_sample=sample_set.odd_sample)
+            Answer.objects.create(question=question, result=result, answer_code='A', answer_text='Text A')
+        return panel
+
+    def setUp(self):
+        self.scale = Scale.objects.create(name='AB')
+
+
+class PurgePanelsTests(PanelsTestCase):
+    def test_panels_deleted_with_related_rows(self):
+        first, second, kept = self.create_panel(2), self.create_panel(3), self.create_panel(1)
+        rows, deleted = purge_panels([first.id, second.id])
+        self.assertEquals(deleted, {
+            'tasex.Answer': 5,
+            'tasex.Result': 5,
+            'tasex.PanelQuestion': 2,
+            'tasex.Sample': 15,
+            'tasex.SampleSet': 5,
+            'tasex.Panel': 2,
+        })
+        self.assertEquals(rows, 34)
+        self.assertEquals(list(Panel.objects.filter(experiment=kept.experiment)), [kept])
+        for model in (SampleSet, Sample, PanelQuestion):
+            self.assertEquals(set(model.objects.values_list('panel_id', flat=True)), {kept.id})
+        self.assertEquals(Result.objects.get().sample_set.panel, kept)
+        self.assertEquals(Answer.objects.get().question.panel, kept)
+
+    def test_query_count_does_not_depend_on_panel_size(self):
+        small, large = self.create_panel(1), self.create_panel(20)
+        # a batch of results with answers: result ids, savepoint, 2 deletes, release savepoint, no more results;
+        # savepoint, 3 deletes and an update, collector looking up what is left of the panel, release savepoint
+        with self.assertNumQueries(18):
+            purge_panels([small.id])
+        with self.assertNumQueries(18):
+            purge_panels([large.id])
+
+
+class ResetPanelsTests(PanelsTestCase):
+    def test_results_deleted_in_batches(self):
+        panel, kept = self.create_panel(5), self.create_panel(1)
+        version = panel.results_version
+        with self.captureOnCommitCallbacks() as callbacks:
+            rows, deleted = reset_panels([panel.id], batch_size=2)
+        self.assertEquals(deleted, {'tasex.Answer': 5, 'tasex.Result': 5})
+        self.assertEquals(rows, 10)
+        self.assertEquals(len(callbacks), 1)
+
+        panel.refresh_from_db()
+        self.assertGreater(panel.results_version, version)
+        self.assertEquals(SampleSet.objects.filter(panel=panel, is_used=False).count(), 5)
+        self.assertEquals(Sample.objects.filter(panel=panel).count(), 15)
+        self.assertEquals(PanelQuestion.objects.filter(panel=panel).count(), 1)
+        self.assertEquals(Result.objects.get().sample_set.panel, kept)
+        self.assertFalse(SampleSet.objects.filter(panel=kept, is_used=False).exists())
+
+    def rerun(self, client, panel, **data):
+        return client.post(
+            reverse('admin:tasex_panel_changelist'),
+            {'action': 'rerun_panels', '_selected_action': [panel.id], **data},
+            follow=True
+        )
+
+    def test_rerun_admin_action(self):
+        panel = self.create_panel(3)
+        Panel.objects.filter(id=panel.id).update(status=Panel.PanelStatus.PRESENTING_RESULTS)
+        c = Client()
+        c.force_login(User.objects.create_superuser('purge_user', 'mail@mail.com', 'purge_password'))
+
+        # confirmation first
+        response = self.rerun(c, panel)
+        self.assertTemplateUsed(response, 'admin/tasex/panel/rerun_confirmation.html')
+        self.assertContains(response, 'All 3 results and 3 answers')
+        self.assertEquals(Result.objects.count(), 3)
+
+        response = self.rerun(c, panel, post='yes')
+        self.assertContains(response, 'Deleted 3 results and 3 answers of 1 panels')
+        self.assertFalse(Result.objects.exists())
+        self.assertEquals(SampleSet.objects.filter(panel=panel, is_used=False).count(), 3)
+        self.assertEquals(Panel.objects.get(id=panel.id).status, Panel.PanelStatus.PLANNED)
+
+    def test_rerun_stops_accepting_answers_first(self):
+        panel = self.create_panel(1)
+        Panel.objects.filter(id=panel.id).update(status=Panel.PanelStatus.ACCEPTING_ANSWERS)
+        c = Client()
+        c.force_login(User.objects.create_superuser('purge_user', 'mail@mail.com', 'purge_password'))
+
+        # no taster may add results once the reset has started
+        statuses = []
+
+        def reset(panel_ids):
+            statuses.append(Panel.objects.get(id=panel.id).status)
+            return reset_panels(panel_ids)
+
+        with mock.patch('tasex.admin.reset_panels', side_effect=reset):
+            self.rerun(c, panel, post='yes')
+        self.assertEquals(statuses, [Panel.PanelStatus.PLANNED])
+        self.assertFalse(Result.objects.exists())
+
+    def test_rerun_needs_permission(self):
+        panel = self.create_panel(1)
+        user = User.objects.create_user('viewer', 'mail@mail.com', 'viewer_password', is_staff=True)
+        user.user_permissions.set(Permission.objects.filter(codename__in=('view_panel', 'change_panel')))
+        c = Client()
+        c.force_login(user)
+        self.assertNotContains(c.get(reverse('admin:tasex_panel_changelist')), 'rerun_panels')
+        self.rerun(c, panel, post='yes')
+        self.assertEquals(Result.objects.count(), 1)
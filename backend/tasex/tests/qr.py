@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Experiment, Panel
+from ..qr import render_qr
+
+
+class QrCodeTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.pnl = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=3,
+            status=Panel.PanelStatus.ACCEPTING_ANSWERS
+        )
+        self.url = reverse('tasex:panel-qr', kwargs={'pk': self.pnl.id})
+        render_qr.cache_clear()
+
+    def test_formats(self):
+        c = Client()
+        response = c.get(self.url)
+        self.assertEquals(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+
+        response = c.get(self.url, {'format': 'svg'})
+        self.assertEquals(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+
+        self.assertEquals(c.get(self.url, {'format': 'gif'}).status_code, 404)
+        self.assertEquals(c.get(self.url, {'size': 'big'}).status_code, 400)
+        self.assertEquals(c.get(self.url, {'size': 1000}).status_code, 400)
+
+    def test_rendered_once(self):
+        c = Client()
+        with mock.patch('tasex.qr._render_qr', return_value=b'qr') as render:
+            first = c.get(self.url, {'size': 10})
+            second = c.get(self.url, {'size': 10})
+            c.get(self.url, {'size': 11})
+        self.assertEquals(render.call_count, 2)
+        self.assertEquals(first.content, second.content)
+        self.assertEquals(first['ETag'], second['ETag'])
+        self.assertIn('max-age=', first['Cache-Control'])
+
+        with mock.patch('tasex.qr._render_qr') as render:
+            response = c.get(self.url, {'size': 10}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEquals(response.status_code, 304)
+        render.assert_not_called()
+
+    def test_cards(self):
+        cards_url = reverse('tasex:panel-qr-cards', kwargs={'pk': self.pnl.id})
+        self.assertEquals(Client().get(cards_url).status_code, 403)
+
+        c = Client()
+        c.force_login(User.objects.create_superuser('qr_user', 'mail@mail.com', 'qr_password'))
+        response = c.get(cards_url)
+        self.assertContains(response, f'{self.url}?format=svg', count=3)
+        response = c.get(cards_url, {'count': 20})
+        self.assertContains(response, f'{self.url}?format=svg', count=20)
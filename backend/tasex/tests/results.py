@@ -0,0 +1,229 @@
+from django.contrib import admin
+from django.contrib.auth.models import User
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Experiment, Panel, SampleSet, Result, Scale, ScalePoint, PanelQuestion, Answer
+from ..charts import CHART_CACHE_TIMEOUT, CHART_FORMATS
+from ..results import summarize_panel, summarize_survey
+
+
+class PanelWithResultsTestCase(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.exp = Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7')
+        self.pnl = Panel.objects.create(
+            experiment=self.exp,
+            description='pnl_description',
+            planned_panelists=6,
+            status=Panel.PanelStatus.ACCEPTING_ANSWERS
+        )
+        # 4 answers, first 3 correct
+        for idx, sample_set in enumerate(SampleSet.objects.filter(panel=self.pnl).order_by('id')[:4]):
+            odd_sample = sample_set.odd_sample
+            if idx == 3:
+                odd_sample = sample_set.samples.exclude(id=sample_set.odd_sample_id).first()
+            Result.objects.create(sample_set=sample_set, odd_sample=odd_sample)
+
+
+class PanelSummaryTests(PanelWithResultsTestCase):
+    def test_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = summarize_panel(self.pnl)
+        self.assertEquals(summary.participants, 4)
+        self.assertEquals(summary.correct, 3)
+        self.assertEquals(summary.wrong, 1)
+        self.assertEquals(summary.percent_correct, 75)
+        self.assertAlmostEqual(summary.p_value, 1 - (2/3) ** 4 - 4 * (1/3) * (2/3) ** 3 - 6 * (1/3) ** 2 * (2/3) ** 2)
+        # sample sets alternate odd product, wrong answer was given for the last set
+        last_odd_product = SampleSet.objects.filter(panel=self.pnl).order_by('id')[3].odd_product_id
+        self.assertEquals(
+            {row.product_id: (row.participants, row.correct) for row in summary.by_odd_product},
+            {
+                self.exp.product_A_id: (2, 1 if last_odd_product == self.exp.product_A_id else 2),
+                self.exp.product_B_id: (2, 1 if last_odd_product == self.exp.product_B_id else 2),
+            }
+        )
+
+    def test_empty_panel(self):
+        Result.objects.all().delete()
+        summary = summarize_panel(self.pnl)
+        self.assertEquals(summary.participants, 0)
+        self.assertEquals(summary.percent_correct, 0)
+        self.assertEquals(summary.p_value, 1)
+
+    def test_api(self):
+        c = Client()
+        c.force_login(User.objects.create_superuser('super_user', 'mail@mail.com', 'super_password'))
+        response = c.get(f'/api/panels/{self.pnl.id}/results/')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()['participants'], 4)
+        self.assertEquals(response.json()['correct'], 3)
+        self.assertEquals(len(response.json()['by_odd_product']), 2)
+
+
+class SurveySummaryTests(PanelWithResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.scale = Scale.objects.create(name='ABC')
+        for code in 'ABC':
+            ScalePoint.objects.create(scale=self.scale, code=code, text=f'Text {code}')
+        # questions are added to planned panels only
+        self.pnl.status = Panel.PanelStatus.PLANNED
+        self.pnl.save()
+        self.questions = [
+            PanelQuestion.objects.create(panel=self.pnl, order=order, question_text=f'Q{order}', scale=self.scale)
+            for order in range(3)
+        ]
+        for result in Result.objects.all():
+            for question in self.questions:
+                Answer.objects.create(question=question, result=result, answer_code='A', answer_text='Text A')
+
+    def test_survey_in_constant_queries(self):
+        # answer counts, questions with scales, scale points
+        with self.assertNumQueries(3):
+            questions = summarize_survey(self.pnl)
+        self.assertEquals(len(questions), 3)
+        for question in questions:
+            # answers of the panelist with wrong odd sample are not counted
+            self.assertEquals(question.answers, 3)
+            self.assertEquals(question.points, (('A', 'Text A', 3), ('B', 'Text B', 0), ('C', 'Text C', 0)))
+
+    def test_no_answers(self):
+        Answer.objects.all().delete()
+        with self.assertNumQueries(1):
+            self.assertEquals(summarize_survey(self.pnl), ())
+
+    def test_answers_bump_version_once(self):
+        version = Panel.objects.get(id=self.pnl.id).results_version
+        # saving an answer does not write the panel row, whoever saves answers bumps the version once
+        answer = Answer.objects.first()
+        with self.assertNumQueries(1):
+            answer.save()
+
+        c = Client()
+        c.force_login(User.objects.create_superuser('answer_user', 'mail@mail.com', 'answer_password'))
+        response = c.post(reverse('admin:tasex_answer_change', args=(answer.id,)), {
+            'question': answer.question_id,
+            'result': answer.result_id,
+            'answer_code': 'B',
+            'answer_text': 'Text B'
+        })
+        self.assertEquals(response.status_code, 302)
+        self.assertEquals(Panel.objects.get(id=self.pnl.id).results_version, version + 1)
+
+    def test_question_deleted_in_panel_inline_bumps_version(self):
+        version = Panel.objects.get(id=self.pnl.id).results_version
+        panel_admin = admin.site._registry[Panel]
+        self.questions[0].delete()
+        formset = mock.Mock(model=PanelQuestion, deleted_objects=[self.questions[0]])
+        with mock.patch('django.contrib.admin.ModelAdmin.save_formset'):
+            panel_admin.save_formset(None, mock.Mock(instance=self.pnl), formset, True)
+        self.assertEquals(Panel.objects.get(id=self.pnl.id).results_version, version + 1)
+
+
+class ResultChartsTests(PanelWithResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        Panel.objects.filter(id=self.pnl.id).update(status=Panel.PanelStatus.PRESENTING_RESULTS)
+        self.pnl.refresh_from_db()
+
+    def chart_url(self, version=None, chart_format='svg'):
+        return reverse('tasex:panel-chart', kwargs={
+            'pk': self.pnl.id,
+            'version': self.pnl.results_version if version is None else version,
+            'name': 'correct',
+            'chart_format': chart_format
+        })
+
+    def test_results_page_links_charts(self):
+        response = Client().get(self.pnl.get_absolute_url())
+        self.assertTemplateUsed(response, 'tasex/panel_results.html')
+        self.assertContains(response, self.chart_url())
+
+    def test_chart_rendered_once(self):
+        c = Client()
+        with mock.patch.dict('tasex.charts.CHART_FORMATS', {'svg': (mock.Mock(return_value=b'svg'), 'image/svg+xml')}):
+            render, _ = CHART_FORMATS['svg']
+            for _ in range(3):
+                response = c.get(self.chart_url())
+                self.assertEquals(response.status_code, 200)
+                self.assertEquals(response.content, b'svg')
+            self.assertEquals(render.call_count, 1)
+
+            self.assertEquals(response['Cache-Control'], f'public, max-age={CHART_CACHE_TIMEOUT}')
+
+            for if_none_match in (response['ETag'], f'"other", W/{response["ETag"]}', '*'):
+                response = c.get(self.chart_url(), HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEquals(response.status_code, 304)
+            # part of the ETag does not match
+            response = c.get(self.chart_url(), HTTP_IF_NONE_MATCH=f'"x{response["ETag"][1:]}')
+            self.assertEquals(response.status_code, 200)
+
+    def test_new_result_invalidates_chart(self):
+        version = self.pnl.results_version
+        sample_set = SampleSet.objects.filter(panel=self.pnl, is_used=False).first()
+        Result.objects.create(sample_set=sample_set, odd_sample=sample_set.odd_sample)
+        self.pnl.refresh_from_db()
+        self.assertEquals(self.pnl.results_version, version + 1)
+
+        response = Client().get(self.chart_url(version))
+        self.assertRedirects(response, self.chart_url(), fetch_redirect_response=False)
+
+    def test_result_deleted_in_admin_invalidates_chart(self):
+        version = self.pnl.results_version
+        c = Client()
+        c.force_login(User.objects.create_superuser('results_user', 'mail@mail.com', 'results_password'))
+        response = c.post(
+            reverse('admin:tasex_result_changelist'),
+            {
+                'action': 'delete_selected',
+                '_selected_action': list(Result.objects.values_list('id', flat=True)[:2]),
+                'post': 'yes'
+            }
+        )
+        self.assertEquals(response.status_code, 302)
+        self.pnl.refresh_from_db()
+        self.assertEquals(self.pnl.results_version, version + 1)
+        self.assertEquals(Result.objects.filter(sample_set__panel=self.pnl).count(), 2)
+
+    def test_panel_deleted_without_loading_results(self):
+        other = Panel.objects.create(experiment=self.exp, description='other', planned_panelists=6)
+        for sample_set in SampleSet.objects.filter(panel=other).select_related('odd_sample'):
+            Result.objects.create(sample_set=sample_set, odd_sample=sample_set.odd_sample)
+        # results are deleted by a query whatever their number, no version bump per deleted row
+        with self.assertNumQueries(14):
+            Panel.objects.get(id=self.pnl.id).delete()
+        with self.assertNumQueries(14):
+            Panel.objects.get(id=other.id).delete()
+
+    def test_chart_formats(self):
+        c = Client()
+        response = c.get(self.chart_url())
+        self.assertEquals(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+        self.assertIn(b'Poprawnie (3)', response.content)
+
+        response = c.get(self.chart_url(chart_format='json'))
+        self.assertEquals(response.json()['values'], [3, 1])
+
+        response = c.get(self.chart_url(chart_format='png'))
+        self.assertEquals(response['Content-Type'], 'image/png')
+
+        response = c.get(self.chart_url(chart_format='gif'))
+        self.assertEquals(response.status_code, 404)
+
+    def test_hidden_panel_chart(self):
+        Panel.objects.filter(id=self.pnl.id).update(status=Panel.PanelStatus.HIDDEN)
+        response = Client().get(self.chart_url())
+        self.assertEquals(response.status_code, 403)
+
+        # seen by the owner, not kept by shared caches
+        c = Client()
+        c.force_login(User.objects.create_superuser('chart_user', 'mail@mail.com', 'chart_password'))
+        response = c.get(self.chart_url())
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
@@ -0,0 +1,45 @@
+from fractions import Fraction
+from math import comb
+
+from django.test import SimpleTestCase
+
+from ..significance import p_value, correct_needed, critical_values, EXACT_LIMIT
+
+
+class SignificanceTests(SimpleTestCase):
+    def test_p_value_matches_binomial_tail(self):
+        for participants in (1, 2, 7, 30):
+            for correct in range(participants + 1):
+                expected = sum(
+                    comb(participants, k) * Fraction(1, 3) ** k * Fraction(2, 3) ** (participants - k)
+                    for k in range(correct, participants + 1)
+                )
+                self.assertAlmostEqual(p_value(correct, participants), float(expected), places=12)
+
+    def test_p_value_edge_cases(self):
+        self.assertEquals(p_value(0, 0), 1)
+        self.assertEquals(p_value(0, 10), 1)
+        self.assertEquals(p_value(11, 10), 0)
+        self.assertAlmostEqual(p_value(3, 3), 1 / 27)
+
+    def test_large_panels_use_log_space(self):
+        participants = EXACT_LIMIT + 1
+        # tails computed in log space continue the exact ones smoothly
+        self.assertAlmostEqual(
+            p_value(EXACT_LIMIT // 3 + 20, EXACT_LIMIT) / p_value(participants // 3 + 20, participants),
+            1,
+            places=1
+        )
+        self.assertLess(p_value(participants // 2, participants), 1e-20)
+
+    def test_critical_values(self):
+        # triangle test table (ISO 4120) for alpha = 0.05
+        table = critical_values(36)
+        self.assertIsNone(table[2])
+        self.assertEquals(table[3], 3)
+        self.assertEquals(table[6], 5)
+        self.assertEquals(table[12], 8)
+        self.assertEquals(table[24], 13)
+        self.assertEquals(table[30], 15)
+        self.assertEquals(table[36], 18)
+        self.assertEquals(correct_needed(36, alpha=0.001), 22)
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# libraries loaded only by views that need them (results, exports)
+HEAVY_MODULES = ('matplotlib', 'scipy', 'numpy')
+# seconds to set up django and import all the views, generous to keep slow CI machines green
+STARTUP_BUDGET = 3.0
+
+STARTUP_SCRIPT = f'''
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+start = time.perf_counter()
+import django
+django.setup()
+import backend.urls
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'heavy_modules': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+'''
+
+
+class StartupBenchmark(SimpleTestCase):
+    def test_startup(self):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True
+        ).stdout
+        startup = json.loads(output.splitlines()[-1])
+
+        self.assertEquals(startup['heavy_modules'], [])
+        self.assertLess(startup['seconds'], STARTUP_BUDGET)
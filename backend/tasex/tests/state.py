@@ -0,0 +1,63 @@
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.test import TestCase, SimpleTestCase, Client, RequestFactory, override_settings
+
+from ..models import Experiment, Panel, Sample, SampleSet, Result
+from ..state import PANEL_STATE_COOKIE, PANEL_STATE_SALT, PanelStateStore
+
+
+class PanelStateStoreTests(SimpleTestCase):
+    def test_incomplete_store_not_created(self):
+        class LoadOnlyStore(PanelStateStore):
+            def load(self, panel_id):
+                return None
+
+        with self.assertRaises(TypeError):
+            LoadOnlyStore(RequestFactory().get('/'))
+
+
+@override_settings(TASEX_PANEL_STATE_STORE='tasex.state.SignedCookiePanelStateStore')
+class SignedCookiePanelStateTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.pnl = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=5,
+            status=Panel.PanelStatus.ACCEPTING_ANSWERS
+        )
+        self.c = Client()
+
+    def state(self):
+        panels = signing.loads(self.c.cookies[PANEL_STATE_COOKIE].value, salt=PANEL_STATE_SALT)
+        return panels.get(str(self.pnl.id))
+
+    def test_flow_without_sessions(self):
+        sample_set = SampleSet.objects.filter(panel=self.pnl).select_related('odd_sample').first()
+        url = self.pnl.get_absolute_url()
+
+        self.c.get(url)
+        self.assertEquals(self.state()['step'], 1)
+        self.c.post(url, data={'code': sample_set.odd_sample.code})
+        self.assertEquals(self.state()['step'], 2)
+        self.c.post(url, data={'are_samples_correct': 'True'})
+        self.assertEquals(self.state()['step'], 3)
+        self.c.post(url, data={'odd_sample': sample_set.odd_sample_id})
+
+        result = Result.objects.get(sample_set=sample_set)
+        self.assertTrue(result.is_correct)
+        self.assertEquals(self.state()['result'], result.id)
+        self.assertEquals(Session.objects.count(), 0)
+
+    def test_tampered_cookie_ignored(self):
+        self.c.get(self.pnl.get_absolute_url())
+        value = self.c.cookies[PANEL_STATE_COOKIE].value
+        forged = signing.dumps({str(self.pnl.id): dict(self.state(), step=3)}, salt='other', compress=True)
+        self.c.cookies[PANEL_STATE_COOKIE] = forged
+        self.assertNotEqual(forged, value)
+
+        response = self.c.post(self.pnl.get_absolute_url(), data={'odd_sample': Sample.objects.first().id})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(Result.objects.count(), 0)
+        self.assertEquals(self.state()['step'], 1)
@@ -4,7 +4,7 @@ from json import dumps
 from django.test import TestCase, Client
 from django.urls import reverse
 
-from ..models import Experiment, Product, Panel, SampleSet, Sample, Result
+from ..models import Experiment, Product, Panel, SampleSet, Sample, Result, Answer, PanelQuestion, Scale, ScalePoint
 
 
 class SingleSampleFormTests(TestCase):
@@ -62,6 +62,27 @@ class SingleSampleFormTests(TestCase):
         self.assertEquals(response.status_code, 200)
         self.assertContains(response, 'Ten numer próbki został już wykorzystany', html=True)
 
+    def test_sample_set_claimed_once(self):
+        code, sample_set_id = (Sample.objects
+                               .filter(sample_set__panel=self.pnl)
+                               .values_list('code', 'sample_set_id')[2])
+        first, second = Client(), Client()
+        # both panelists enter the code before any of them confirms the set
+        for c in (first, second):
+            c.post(self.pnl.get_absolute_url(), data={'code': code})
+            self.assertEquals(c.session.get('panels').get(str(self.pnl.id))['step'], 2)
+
+        first.post(self.pnl.get_absolute_url(), data={'are_samples_correct': 'True'})
+        self.assertEquals(first.session.get('panels').get(str(self.pnl.id))['step'], 3)
+        self.assertEquals(
+            first.session.get('panels').get(str(self.pnl.id))['claim_token'],
+            str(SampleSet.objects.get(id=sample_set_id).claim_token)
+        )
+
+        response = second.post(self.pnl.get_absolute_url(), data={'are_samples_correct': 'True'}, follow=True)
+        self.assertEquals(second.session.get('panels').get(str(self.pnl.id))['step'], 1)
+        self.assertContains(response, 'Ten zestaw próbek został już wykorzystany')
+
     def test_happy_path(self):
         sample_id, code, sample_set_id = choice(
             Sample.objects.filter(sample_set__panel=self.pnl).values_list('id', 'code', 'sample_set_id')
@@ -244,3 +265,62 @@ class SingleSampleFormTests(TestCase):
         self.assertIsNotNone(result_id)
         result_code = Result.objects.get(id=result_id).odd_sample.code
         self.assertEquals(result_code, code)
+
+
+class PanelQuestionsTests(TestCase):
+    fixtures = ['test_base']
+
+    def setUp(self):
+        self.pnl = Panel.objects.create(
+            experiment=Experiment.objects.get(id='aaa66601-3b2e-4695-bc78-d1becc8428c7'),
+            description='pnl_description',
+            planned_panelists=5,
+        )
+        scale = Scale.objects.create(name='ABC')
+        for code in 'ABC':
+            ScalePoint.objects.create(scale=scale, code=code, text=f'Text {code}')
+        self.questions = [
+            PanelQuestion.objects.create(panel=self.pnl, order=order, question_text=f'Q{order}', scale=scale)
+            for order in range(3)
+        ]
+        Panel.objects.filter(id=self.pnl.id).update(status=Panel.PanelStatus.ACCEPTING_ANSWERS)
+
+        sample_set = SampleSet.objects.filter(panel=self.pnl).first()
+        self.result = Result.objects.create(sample_set=sample_set, odd_sample=sample_set.odd_sample)
+        self.c = Client()
+        self.c.get(self.pnl.get_absolute_url())
+        self.set_state(step=4)
+
+    def set_state(self, **state):
+        s = self.c.session
+        s.get('panels').get(str(self.pnl.id)).update(result=self.result.id, **state)
+        s.save()
+
+    def answer(self):
+        return self.c.post(
+            self.pnl.get_absolute_url(),
+            data={str(question.id): 'B' for question in self.questions}
+        )
+
+    def test_answers_saved_once(self):
+        response = self.answer()
+        self.assertRedirects(response, self.pnl.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEquals(self.c.session.get('panels').get(str(self.pnl.id))['step'], 5)
+        self.assertEquals(Answer.objects.filter(result=self.result, answer_code='B', answer_text='Text B').count(), 3)
+
+        # the same submission replayed with the session from before it
+        self.set_state(step=4)
+        response = self.answer()
+        self.assertRedirects(response, self.pnl.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEquals(Answer.objects.filter(result=self.result).count(), 3)
+
+        # resent once the panelist is already waiting for results
+        response = self.answer()
+        self.assertRedirects(response, self.pnl.get_absolute_url())
+        self.assertEquals(Answer.objects.filter(result=self.result).count(), 3)
+
+    def test_answers_saved_in_constant_queries(self):
+        # session, questions, scale points (panel status is cached since the first page),
+        # savepoint, insert answers, bump results version, release savepoint, session update (3)
+        with self.assertNumQueries(10):
+            self.answer()
@@ -1,13 +1,20 @@
 from django.urls import path
 
-from .views import PanelView, render_qr_code, SampleSetsView, SamplePreparationView, UpdatePanelStatusView
+from .views import (PanelView, render_chart, render_qr_code, stream_results, export_prep_sheet, export_results,
+                    QrCardsView, SampleSetsView, SamplePreparationView, UpdatePanelStatusView)
 
 app_name = 'tasex'
 
 urlpatterns = [
     path('<pk>/', PanelView.as_view(), name='panel'),
     path('<pk>/qr/', render_qr_code, name='panel-qr'),
+    path('<pk>/qr/cards/', QrCardsView.as_view(), name='panel-qr-cards'),
+    path('<pk>/charts/<int:version>/<slug:name>.<chart_format>', render_chart, name='panel-chart'),
+    path('<pk>/live/', stream_results, name='panel-live'),
     path('<pk>/sets/', SampleSetsView.as_view(), name='panel-sets'),
     path('<pk>/products/', SamplePreparationView.as_view(), name='panel-prepare'),
+    path('<pk>/prep.<sheet_format>', export_prep_sheet, name='panel-prep-sheet'),
+    path('<pk>/results.<export_format>', export_results, name='panel-results-export'),
+    path('experiments/<experiment_pk>/results.<export_format>', export_results, name='experiment-results-export'),
     path('<pk>/status/<status>', UpdatePanelStatusView.as_view(), name='panel-update-status'),
 ]
\ No newline at end of file
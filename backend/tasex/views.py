@@ -1,34 +1,59 @@
-import qrcode
-
+from asgiref.sync import sync_to_async
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import BadRequest, PermissionDenied, ValidationError
-from django.db import models
-from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, Http404, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import reverse, get_object_or_404
+from django.utils.functional import cached_property
+from django.utils.http import parse_etags
 from django.views.generic import DetailView, FormView, ListView, RedirectView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
+from .charts import CHART_CACHE_TIMEOUT, CHART_FORMATS, get_chart
+from .context import get_panel_context, forget_panel_status
+from .exports import PREP_LAYOUTS, PREP_SHEET_FORMATS, RESULT_FORMATS, parquet_available, result_rows
+from .filters import ExperimentFilter, PanelFilter
 from .forms import FORM_CLASSES, PanelQuestionsForm
+from .live import RETRY_MILLISECONDS, notify_results_changed, results_event, results_stream
 from .models import Experiment, Panel, Sample, SampleSet, Product, Result, PanelQuestion, Answer
-
-from .serializers import ExperimentSerializer, PanelSerializer
+from .qr import (DEFAULT_BORDER, DEFAULT_BOX_SIZE, MAX_BORDER, MAX_BOX_SIZE, QR_CACHE_TIMEOUT, QR_FORMATS,
+                 qr_etag, render_qr)
+
+from .pagination import CreatedCursorPagination
+from .results import summarize_panel, summarize_survey
+from .significance import correct_needed
+from .state import get_panel_state_store
+from .serializers import ExperimentSerializer, PanelSerializer, PanelSummarySerializer
 from .utils import PanelResult, SurveyPlots
 
 
 class ExperimentViewSet(viewsets.ModelViewSet):
     serializer_class = ExperimentSerializer
-    queryset = Experiment.objects.all()
+    queryset = Experiment.objects.select_related('product_A', 'product_B')
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ExperimentFilter
+    pagination_class = CreatedCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
 
 class PanelViewSet(viewsets.ModelViewSet):
     serializer_class = PanelSerializer
-    queryset = Panel.objects.all()
+    queryset = Panel.objects.select_related('experiment')
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ('experiment', 'is_active')
+    filterset_class = PanelFilter
+    pagination_class = CreatedCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True)
+    def results(self, request, pk=None):
+        serializer = PanelSummarySerializer(summarize_panel(self.get_object()).as_dict())
+        return Response(serializer.data)
+
 
 class SamplePreparationView(LoginRequiredMixin, ListView):
     raise_exception = True
@@ -44,22 +69,49 @@ class SamplePreparationView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['samplesA'] = (
-            Sample.objects
-            .filter(product_id=context['products'][0])
-            .filter(sample_set__panel_id=self.kwargs['pk'])
-            .order_by('sample_set__id')
-        )
-        context['samplesB'] = (
-            Sample.objects
-            .filter(product_id=context['products'][1])
-            .filter(sample_set__panel_id=self.kwargs['pk'])
-            .order_by('sample_set__id')
-        )
+        # one query for both products, split here
+        samples = {product.id: [] for product in context['products']}
+        for sample in Sample.objects.filter(panel_id=self.kwargs['pk']).order_by('sample_set_id'):
+            samples[sample.product_id].append(sample)
+        context['samplesA'], context['samplesB'] = samples.values()
 
         return context
 
 
+def export_prep_sheet(request, pk, sheet_format):
+    # streamed, so sheets of big panels are never held in memory as a whole
+    if request.user.is_anonymous:
+        raise PermissionDenied
+    layout = request.GET.get('layout', 'trays')
+    if sheet_format not in PREP_SHEET_FORMATS or layout not in PREP_LAYOUTS:
+        raise Http404
+    panel = get_object_or_404(Panel, id=pk)
+    render, content_type = PREP_SHEET_FORMATS[sheet_format]
+    response = StreamingHttpResponse(render(panel, layout), content_type=content_type)
+    if sheet_format == 'csv':
+        response['Content-Disposition'] = f'attachment; filename="panel-{panel.id}-{layout}.csv"'
+    return response
+
+
+def export_results(request, export_format, pk=None, experiment_pk=None):
+    # results with answers of a panel or an experiment, streamed whatever their number
+    if request.user.is_anonymous:
+        raise PermissionDenied
+    if export_format not in RESULT_FORMATS or (export_format == 'parquet' and not parquet_available()):
+        raise Http404
+    if pk is not None:
+        name = f'panel-{get_object_or_404(Panel, id=pk).id}'
+    else:
+        name = f'experiment-{get_object_or_404(Experiment, id=experiment_pk).id}'
+    render, content_type, _ = RESULT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        render(result_rows(panel_id=pk, experiment_id=experiment_pk)),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{name}-results.{export_format}"'
+    return response
+
+
 class SampleSetsView(LoginRequiredMixin, ListView):
     raise_exception = True
     template_name = 'tasex/owner_panel_sets.html'
@@ -79,9 +131,12 @@ class AdminPanelView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         panel = self.kwargs.get('pk')
         context['statuses'] = Panel.PanelStatus
+        context['parquet_available'] = parquet_available()
+        context['correct_needed'] = correct_needed(self.object.planned_panelists)
         if panel:
             results = Result.objects.filter(sample_set__in=SampleSet.objects.filter(panel_id=panel))
             context['results'] = results.count()
+            context['correct_needed_now'] = correct_needed(context['results'])
             answers = Answer.objects.filter(result__in=results)
             questions = PanelQuestion.objects.filter(panel_id=panel)
             if questions.count():
@@ -91,7 +146,13 @@ class AdminPanelView(LoginRequiredMixin, DetailView):
         return context
 
 
-class ResultsView(DetailView):
+class PanelContextMixin:
+    # panelist views are delegated to from AnonymousPanelView, so they share its panel
+    def get_object(self, queryset=None):
+        return get_panel_context(self.request, self.kwargs.get('pk')).panel
+
+
+class ResultsView(PanelContextMixin, DetailView):
     model = Panel
     template_name = 'tasex/panel_results.html'
     context_object_name = 'panel'
@@ -99,21 +160,31 @@ class ResultsView(DetailView):
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get a context
         context = super().get_context_data(**kwargs)
-        if not Result.objects.filter(sample_set__panel=self.object).exists():
+        summary = summarize_panel(self.object)
+        if not summary.participants:
             self.template_name = 'tasex/panel_results_empty.html'
             return context
-        # Add in a QuerySet of all the books
-        context["panel_result"] = PanelResult(self.object)
-        context["survey_plots"] = SurveyPlots(self.object)
+        context["panel_result"] = PanelResult(summary)
+        chart_names = [PanelResult.chart_name, *SurveyPlots(summarize_survey(self.object)).charts]
+        context["charts"] = [
+            reverse('tasex:panel-chart', kwargs={
+                'pk': self.object.id,
+                'version': self.object.results_version,
+                'name': name,
+                'chart_format': 'svg'
+            })
+            for name in chart_names
+        ]
         return context
 
 
 class PanelState:
-    def __init__(self, panel_id, step=1, sample_set=None, result=None):
+    def __init__(self, panel_id, step=1, sample_set=None, result=None, claim_token=None):
         self.panel_id = panel_id
         self.step = step
         self.sample_set = sample_set
         self.result = result
+        self.claim_token = claim_token
 
 
 class PanelStep1(FormView):
@@ -138,18 +209,28 @@ class PanelStep1(FormView):
                 # reset panel
                 self.panel_state = PanelState(self.panel_id)
             if are_samples_correct == 'True':
-                sample_set = SampleSet.objects.filter(id=self.panel_state.sample_set).update(is_used=True)
+                self.panel_state.claim_token = SampleSet.claim(self.panel_state.sample_set)
+                if not self.panel_state.claim_token:
+                    # someone else confirmed the same set in the meantime
+                    messages.error(self.request, 'Ten zestaw próbek został już wykorzystany')
+                    self.panel_state = PanelState(self.panel_id)
 
             odd_sample = form.cleaned_data.get('odd_sample')
             if odd_sample:
-                self.panel_state.result = Result.objects.create(
-                    sample_set=SampleSet.objects.get(id=self.panel_state.sample_set),
-                    odd_sample=Sample.objects.get(id=odd_sample)
-                )
-                self.panel_state.result = self.panel_state.result.id
+                sample_set = SampleSet.objects.filter(
+                    id=self.panel_state.sample_set,
+                    claim_token=self.panel_state.claim_token
+                ).first()
+                if sample_set:
+                    self.panel_state.result = Result.objects.create(
+                        sample_set=sample_set,
+                        odd_sample=Sample.objects.get(id=odd_sample)
+                    ).id
+                else:
+                    messages.error(self.request, 'Ten zestaw próbek został już wykorzystany')
+                    self.panel_state = PanelState(self.panel_id)
 
-            self.request.session.get('panels')[self.panel_id] = self.panel_state.__dict__
-            self.request.session.save()
+            get_panel_state_store(self.request).save(self.panel_id, self.panel_state.__dict__)
 
         return HttpResponseRedirect(self.get_success_url())
 
@@ -159,6 +240,7 @@ class PanelStep1(FormView):
     def get_form_kwargs(self):
         form_kwargs = super().get_form_kwargs()
         form_kwargs['panel_state'] = self.panel_state
+        form_kwargs['panel_context'] = get_panel_context(self.request, self.panel_id)
         return form_kwargs
 
     def get_form_class(self):
@@ -177,7 +259,7 @@ class PanelStep1(FormView):
 
     def setup(self, request, *args, **kwargs):
         self.panel_id = kwargs.get('pk')
-        self.panel_state = PanelState(**request.session.get('panels').get(self.panel_id))
+        self.panel_state = PanelState(**get_panel_state_store(request).load(self.panel_id))
         return super().setup(request, *args, **kwargs)
 
 
@@ -192,23 +274,32 @@ class PanelQuestionsView(FormView):
 
     def setup(self, request, *args, **kwargs):
         self.panel_id = kwargs.get('pk')
-        self.panel_state = PanelState(**request.session.get('panels').get(self.panel_id))
+        self.panel_state = PanelState(**get_panel_state_store(request).load(self.panel_id))
         return super().setup(request, *args, **kwargs)
 
     def get_form_kwargs(self):
         form_kwargs = super().get_form_kwargs()
         # form_kwargs['panel_state'] = self.panel_state
-        form_kwargs['questions'] = PanelQuestion.objects.filter(panel_id=self.panel_id)
+        form_kwargs['questions'] = self.questions
         return form_kwargs
 
+    @cached_property
+    def questions(self):
+        return list(
+            PanelQuestion.objects
+            .filter(panel_id=self.panel_id)
+            .select_related('scale')
+            .prefetch_related('scale__points')
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product_a = Panel.objects.get(id=self.panel_id).experiment.product_A
-        result = Result.objects.get(id=self.panel_state.result)
+        product_a_id = get_panel_context(self.request, self.panel_id).panel.experiment.product_A_id
+        result = Result.objects.select_related('odd_sample').get(id=self.panel_state.result)
         odd = result.odd_sample
-        other = list(result.sample_set.samples.values_list('code', flat=True))
+        other = list(Sample.objects.filter(sample_set_id=result.sample_set_id).values_list('code', flat=True))
         other.remove(odd.code)
-        if odd.product == product_a:
+        if odd.product_id == product_a_id:
             context['product_a'] = [odd.code]
             context['product_b'] = other
         else:
@@ -218,55 +309,50 @@ class PanelQuestionsView(FormView):
         return context
 
     def form_valid(self, form):
-        # increment panel_state.step
-        self.panel_state.step += 1
-        self.request.session.get('panels')[self.panel_id] = self.panel_state.__dict__
-        self.request.session.save()
-
-        # save answers
-        result = Result.objects.get(id=self.panel_state.result)
-        if Answer.objects.filter(result=result).exists():
-            raise ValidationError('Answers already recorded')
-        for question in PanelQuestion.objects.filter(panel_id=self.panel_id):
+        answers = []
+        for question in self.questions:
             answer = form.cleaned_data.get(str(question.id))
             if answer:
-                answer_text = question.scale.points.get(code=answer).text
-                Answer.objects.create(
+                points = {point.code: point.text for point in question.scale.points.all()}
+                answers.append(Answer(
                     question=question,
-                    result=result,
+                    result_id=self.panel_state.result,
                     answer_code=answer,
-                    answer_text=answer_text
-                )
+                    answer_text=points[answer]
+                ))
+        # all answers or none, a retried submission hits the unique (result, question) constraint and is skipped
+        with transaction.atomic():
+            Answer.objects.bulk_create(answers, ignore_conflicts=True)
+            Panel.bump_results_version(id=self.panel_id)
+            notify_results_changed(self.panel_id)
+
+        # increment panel_state.step once answers are stored
+        self.panel_state.step += 1
+        get_panel_state_store(self.request).save(self.panel_id, self.panel_state.__dict__)
+
         return HttpResponseRedirect(
             reverse('tasex:panel', kwargs={'pk': self.kwargs.get('pk')})
         )
 
 
-class WaitForFinishView(DetailView):
+class WaitForFinishView(PanelContextMixin, DetailView):
     model = Panel
     template_name = 'tasex/panel_wait_for_finish.html'
 
+    def post(self, request, *args, **kwargs):
+        # answers resent after they were stored, show the page instead of failing
+        return HttpResponseRedirect(reverse('tasex:panel', kwargs={'pk': self.kwargs.get('pk')}))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        panel = self.get_object()
-        result_id = self.request.session.get('panels').get(str(panel.id)).get('result')
-        result = Result.objects.get(id=result_id)
+        panel = self.object
+        result_id = get_panel_state_store(self.request).load(str(panel.id)).get('result')
+        result = Result.objects.select_related('odd_sample', 'sample_set__odd_sample').get(id=result_id)
         is_correct = result.is_correct
         context["is_correct"] = is_correct
-        odd_product = (
-            Sample.objects
-            .filter(sample_set=result.sample_set)
-            .values('product_id')
-            .annotate(cnt=models.Count('product_id'))
-            .filter(cnt=1)
-            .values_list('product_id', flat=True)[0]
-        )
-        odd_sample = (
-            Sample.objects
-            .filter(sample_set=result.sample_set)
-            .get(product_id=odd_product)
-        )
-        context["correct_sample"] = odd_sample.code
+        # resolves odd sample of sets generated before it was stored
+        result.sample_set.get_odd_sample_id()
+        context["correct_sample"] = result.sample_set.odd_sample.code
         context["user_sample"] = result.odd_sample.code
 
         # add panel/experiment details if panel says so
@@ -279,7 +365,7 @@ class WaitForFinishView(DetailView):
         return context
 
 
-class AnonymousPanelView(DetailView):
+class AnonymousPanelView(PanelContextMixin, DetailView):
     model = Panel
     template_name = 'tasex/panel_closed.html'
 
@@ -287,8 +373,9 @@ class AnonymousPanelView(DetailView):
     # queryset = Panel.objects.filter(~Q(status=Panel.PanelStatus.HIDDEN))
 
     def dispatch(self, request, *args, **kwargs):
-        # decide what to serve depending on panel status
-        match self.get_object().status:
+        # decide what to serve depending on panel status, the panel itself is loaded only if the page needs it
+        panel_context = get_panel_context(request, kwargs.get('pk'))
+        match panel_context.status:
             case Panel.PanelStatus.HIDDEN:
                 raise PermissionDenied
             case Panel.PanelStatus.PLANNED:
@@ -298,28 +385,25 @@ class AnonymousPanelView(DetailView):
 
             case Panel.PanelStatus.ACCEPTING_ANSWERS:
                 # if panel is accepting_answers, the status of the user will be saved
-                panel_id = str(self.get_object().id)
+                panel_id = panel_context.panel_id
 
-                # save session
-                if not request.session or not request.session.session_key or not request.session.get('panels'):
-                    request.session['panels'] = {}
-                    request.session.save()
-                # update session with this panel
-                if not request.session.get('panels', {}).get(panel_id):
-                    request.session.get('panels')[panel_id] = PanelState(panel_id).__dict__
-                    request.session.save()
+                # store state of the user for this panel
+                panel_states = get_panel_state_store(request)
+                if not panel_states.load(panel_id):
+                    panel_states.save(panel_id, PanelState(panel_id).__dict__)
 
                 # check user status
-                step = (request.session.get('panels', {}).get(panel_id, {}).get('step'))
+                step = panel_states.load(panel_id).get('step')
                 if step in FORM_CLASSES:
-                    return PanelStep1.as_view()(request, *args, **kwargs)
+                    view = PanelStep1
                 elif step == len(FORM_CLASSES) + 1:
-                    return PanelQuestionsView.as_view()(request, *args, **kwargs)
+                    view = PanelQuestionsView
                 else:
-                    return WaitForFinishView.as_view()(request, *args, **kwargs)
+                    view = WaitForFinishView
+                return panel_states.commit(view.as_view()(request, *args, **kwargs))
             case _:
                 # for debug
-                raise BadRequest(f'I do not know what to do with panel status {self.get_object().status}')
+                raise BadRequest(f'I do not know what to do with panel status {panel_context.status}')
         return super().dispatch(request, *args, **kwargs)
 
 
@@ -331,6 +415,7 @@ class UpdatePanelStatusView(LoginRequiredMixin, RedirectView):
         new_status = self.kwargs.get('status')
         if new_status in Panel.PanelStatus:
             Panel.objects.filter(id=self.kwargs.get('pk')).update(status=new_status)
+            forget_panel_status(self.kwargs.get('pk'))
         return super().get(request, *args, **kwargs)
 
 
@@ -344,25 +429,117 @@ class PanelView(DetailView):
             return AdminPanelView.as_view()(request, *args, **kwargs)
 
 
+def etag_matches(request, etag):
+    # weak comparison, as for If-None-Match
+    etags = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+    return '*' in etags or etag in etags
+
+
+def render_chart(request, pk, version, name, chart_format):
+    if chart_format not in CHART_FORMATS:
+        raise Http404
+    panel = get_object_or_404(Panel, id=pk)
+    if request.user.is_anonymous and panel.status != Panel.PanelStatus.PRESENTING_RESULTS:
+        raise PermissionDenied
+    # results changed since the page was rendered
+    if version != panel.results_version:
+        return HttpResponseRedirect(
+            reverse('tasex:panel-chart', kwargs={
+                'pk': pk,
+                'version': panel.results_version,
+                'name': name,
+                'chart_format': chart_format
+            })
+        )
+
+    etag = f'"{panel.id}-{version}-{name}.{chart_format}"'
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        chart = get_chart(panel, name, chart_format)
+        if chart is None:
+            raise Http404
+        _, content_type = CHART_FORMATS[chart_format]
+        response = HttpResponse(chart, content_type=content_type)
+    response['ETag'] = etag
+    # url changes with every results version, so its content never does,
+    # shared caches keep only charts anyone may see
+    public = panel.status == Panel.PanelStatus.PRESENTING_RESULTS
+    response['Cache-Control'] = f'{"public" if public else "private"}, max-age={CHART_CACHE_TIMEOUT}'
+    return response
+
+
+async def stream_results(request, pk):
+    # running results for the admin dashboard, as server-sent events
+    def get_panel():
+        if request.user.is_anonymous:
+            raise PermissionDenied
+        return get_object_or_404(Panel, id=pk)
+
+    panel = await sync_to_async(get_panel)()
+    if isinstance(request, ASGIRequest):
+        content = results_stream(panel)
+    else:
+        # without ASGI the connection cannot be held open, browser gets current results and reconnects later
+        content = [f'retry: {RETRY_MILLISECONDS}\n', await sync_to_async(results_event)(panel)]
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would buffer the events otherwise
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def qr_options(request):
+    # format, box size and border requested in query string
+    qr_format = request.GET.get('format', 'png')
+    if qr_format not in QR_FORMATS:
+        raise Http404
+    try:
+        box_size = int(request.GET.get('size', DEFAULT_BOX_SIZE))
+        border = int(request.GET.get('border', DEFAULT_BORDER))
+    except ValueError:
+        raise BadRequest('QR code size and border must be numbers')
+    if not (1 <= box_size <= MAX_BOX_SIZE and 0 <= border <= MAX_BORDER):
+        raise BadRequest('QR code size or border out of range')
+    return qr_format, box_size, border
+
+
 def render_qr_code(request, pk):
     if (
         request.user.is_anonymous
         and
-        get_object_or_404(Panel, id=pk).status == Panel.PanelStatus.HIDDEN
+        get_panel_context(request, pk).status == Panel.PanelStatus.HIDDEN
     ):
         raise PermissionDenied
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=qrcode.constants.ERROR_CORRECT_Q,
-        box_size=5,
-        border=4,
-    )
-    qr.add_data(
-        request.build_absolute_uri(reverse('tasex:panel', kwargs={'pk': pk}))
-    )
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    response = HttpResponse(content_type="image/png")
-    img.save(response, 'PNG')
+    qr_format, box_size, border = qr_options(request)
+    url = request.build_absolute_uri(reverse('tasex:panel', kwargs={'pk': pk}))
+
+    etag = qr_etag(url, qr_format, box_size, border)
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        _, content_type = QR_FORMATS[qr_format]
+        response = HttpResponse(render_qr(url, qr_format, box_size, border), content_type=content_type)
+    response['ETag'] = etag
+    # url of the panel never changes, neither does its code
+    response['Cache-Control'] = f'max-age={QR_CACHE_TIMEOUT}'
     return response
+
+
+class QrCardsView(LoginRequiredMixin, DetailView):
+    # page of QR code cards to print, one per table
+    raise_exception = True
+    model = Panel
+    template_name = 'tasex/owner_panel_qr_cards.html'
+    max_cards = 500
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            cards = int(self.request.GET.get('count', self.object.planned_panelists))
+        except ValueError:
+            raise BadRequest('Number of cards must be a number')
+        # every card shows the same image, so the browser downloads it once
+        context['cards'] = range(max(1, min(cards, self.max_cards)))
+        context['qr_url'] = reverse('tasex:panel-qr', kwargs={'pk': self.object.id}) + '?format=svg'
+        return context